@@ -0,0 +1,370 @@
+"""
+Benchmarks for paperai query paths.
+
+Usage:
+  python benchmarks.py <benchmark> <path to model directory>
+"""
+
+import argparse
+import os
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+
+from txtai.embeddings import Embeddings
+from txtai.pipeline import Tokenizer
+
+from paperai.fts import FTS
+from paperai.highlights import Highlights
+from paperai.index import Index
+from paperai.models import Models
+from paperai.query import Query
+from paperai.report.annotate import Annotate
+
+
+class Benchmarks:
+    """
+    Runs timing benchmarks against a paperai model directory.
+    """
+
+    @staticmethod
+    def timer(name, function, runs=5):
+        """
+        Runs function multiple times and prints the best and mean times.
+
+        Args:
+            name: benchmark name
+            function: function to time
+            runs: number of timed runs
+
+        Returns:
+            best time in seconds
+        """
+
+        times = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            function()
+            times.append(time.perf_counter() - start)
+
+        print(f"{name:<30} best {min(times):.4f}s, mean {sum(times) / len(times):.4f}s")
+        return min(times)
+
+    @staticmethod
+    def ids(dbfile, queries, topn):
+        """
+        Samples section ids that simulate search results. Each query returns topn * 5 ids, which matches the number of
+        results Query.search resolves per query.
+
+        Args:
+            dbfile: SQLite file
+            queries: number of simulated queries
+            topn: number of documents per query
+
+        Returns:
+            list of section id lists, one per query
+        """
+
+        with sqlite3.connect(dbfile) as db:
+            maxid = db.execute("SELECT max(id) FROM sections").fetchone()[0]
+
+        generator = random.Random(0)
+        return [[generator.randint(0, maxid) for _ in range(topn * 5)] for _ in range(queries)]
+
+    @staticmethod
+    def lookups(db, ids):
+        """
+        Resolves section ids one at a time, the same way Query.search resolves results.
+
+        Args:
+            db: database connection
+            ids: list of section id lists
+        """
+
+        cur = db.cursor()
+        for query in ids:
+            for uid in query:
+                cur.execute("SELECT Article, Text FROM sections WHERE id = ?", [uid])
+                cur.fetchone()
+
+    @staticmethod
+    def connection(path, queries=100, topn=50):
+        """
+        Compares per-result section lookups with a default connection and a tuned read-only connection.
+
+        Args:
+            path: model path
+            queries: number of simulated queries
+            topn: number of documents per query
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+        ids = Benchmarks.ids(dbfile, queries, topn)
+
+        db = sqlite3.connect(dbfile)
+        baseline = Benchmarks.timer("default connection", lambda: Benchmarks.lookups(db, ids))
+        db.close()
+
+        db = Models.connect(dbfile)
+        tuned = Benchmarks.timer("read-only tuned connection", lambda: Benchmarks.lookups(db, ids))
+        db.close()
+
+        print(f"Speedup: {baseline / tuned:.2f}x")
+
+    @staticmethod
+    def resolve(path, queries=100, topn=50):
+        """
+        Compares resolving search results one section at a time with batched IN queries.
+
+        Args:
+            path: model path
+            queries: number of simulated queries
+            topn: number of documents per query
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+        ids = Benchmarks.ids(dbfile, queries, topn)
+
+        db = Models.connect(dbfile)
+        cur = db.cursor()
+
+        baseline = Benchmarks.timer("per-result lookups", lambda: Benchmarks.lookups(db, ids))
+        batched = Benchmarks.timer("batched lookups", lambda: [Query.sections(cur, query) for query in ids])
+        db.close()
+
+        print(f"Speedup: {baseline / batched:.2f}x")
+
+    @staticmethod
+    def terms(path, queries=20, topn=10, threshold=None):
+        """
+        Compares filtering +required and -prohibited query terms after the vector search with the full text index.
+        Recall is measured against ranking all sections that match the query terms.
+
+        Args:
+            path: model path
+            queries: number of sampled queries
+            topn: number of documents per query
+            threshold: query match score threshold
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        embeddings, db = Models.load(path)
+        if not FTS.attached(db):
+            print("Full text index not found, build the index with --fts")
+            return
+
+        # Connection without the full text index
+        plain = Models.connect(dbfile)
+
+        # Sample queries with a required and a prohibited term from section text
+        generator = random.Random(0)
+        maxid = db.execute("SELECT max(id) FROM sections").fetchone()[0]
+
+        samples = []
+        while len(samples) < queries:
+            row = db.execute("SELECT Text FROM sections WHERE id = ?", [generator.randint(0, maxid)]).fetchone()
+            tokens = [token for token in Tokenizer.tokenize(row[0]) if len(token) >= FTS.MINLENGTH] if row else []
+            if len(tokens) > 4:
+                samples.append(f"{' '.join(tokens[:3])} +{tokens[1]} -{tokens[4]}")
+
+        # Exact results rank all sections that match the query terms
+        limit, FTS.LIMIT = FTS.LIMIT, maxid + 1
+        exact = [set(Query.documents(results, topn)) for results in Query.batchsearch(embeddings, db.cursor(), samples, topn, threshold)]
+        FTS.LIMIT = limit
+
+        for name, connection, adaptive in [("post-filter", plain, False), ("post-filter adaptive", plain, True), ("full text index", db, False)]:
+            start = time.perf_counter()
+            output = Query.batchsearch(embeddings, connection.cursor(), samples, topn, threshold, adaptive)
+            elapsed = time.perf_counter() - start
+
+            documents = [set(Query.documents(results, topn)) for results in output]
+            recall = [len(x & y) / len(y) for x, y in zip(documents, exact) if y]
+            print(f"{name:<30} {elapsed:.4f}s, recall {sum(recall) / len(recall) if recall else 1.0:.4f}")
+
+        plain.close()
+        Models.close(db)
+
+    @staticmethod
+    def highlights(path, sections=500):
+        """
+        Compares the networkx and sparse matrix textrank implementations used to build highlights.
+
+        Args:
+            path: model path
+            sections: number of sampled sections
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        with Models.connect(dbfile) as db:
+            rows = db.execute("SELECT Id, Text FROM sections ORDER BY random() LIMIT ?", [sections]).fetchall()
+
+        output = {}
+        for backend in ["networkx", "sparse"]:
+            output[backend] = Benchmarks.timer(backend, lambda backend=backend: Highlights.textrank(rows, backend=backend), 3)
+
+        networkx, matrix = (dict(Highlights.textrank(rows, backend=backend)) for backend in ["networkx", "sparse"])
+        print(f"Max score difference: {max((abs(networkx[uid] - matrix[uid]) for uid in networkx), default=0):.2e}")
+        print(f"Speedup: {output['networkx'] / output['sparse']:.2f}x")
+
+    @staticmethod
+    def documents(results=25000, articles=5000, topn=50):
+        """
+        Compares grouping search results by article with sorting and with a bounded heap. The sorting implementation
+        includes the additional sort by sum of scores that callers previously ran.
+
+        Args:
+            results: number of simulated search results
+            articles: number of simulated articles
+            topn: number of documents to return
+        """
+
+        generator = random.Random(0)
+        rows = [(x, generator.random(), generator.randint(0, articles), f"text {generator.randint(0, 10)}") for x in range(results)]
+
+        def sort():
+            documents = {}
+            for _, score, article, text in rows:
+                if article not in documents:
+                    documents[article] = set()
+
+                documents[article].add((score, text))
+
+            for uid in documents:
+                documents[uid] = sorted(list(documents[uid]), reverse=True)
+
+            top = sorted(documents, key=lambda k: max(x[0] for x in documents[k]), reverse=True)[:topn]
+            documents = {uid: documents[uid] for uid in top}
+
+            return [(uid, documents[uid]) for uid in sorted(documents, key=lambda k: sum(x[0] for x in documents[k]), reverse=True)]
+
+        baseline = Benchmarks.timer("sort", sort)
+        heap = Benchmarks.timer("bounded heap", lambda: list(Query.documents(rows, topn).items()))
+
+        print(f"Speedup: {baseline / heap:.2f}x")
+
+    @staticmethod
+    def text(path, queries=100, topn=50, annotations=4):
+        """
+        Compares text cleanup with pattern strings against precompiled patterns, with and without result caching. Match
+        text formatting renders topn * 5 sections per query, sampled from a shared pool of sections. PDF annotation
+        formats each 80 character span of a section once per annotation.
+
+        Args:
+            path: model path
+            queries: number of simulated queries
+            topn: number of documents per query
+            annotations: number of annotations per PDF
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        with Models.connect(dbfile) as db:
+            rows = [row[0] for row in db.execute("SELECT Text FROM sections ORDER BY random() LIMIT ?", [topn * 50])]
+
+        generator = random.Random(0)
+        sections = [generator.choice(rows) for _ in range(queries * topn * 5)]
+        spans = [text[x : x + 80] for text in rows[: topn * 5] for x in range(0, len(text), 80)] * annotations
+
+        def text(text):
+            if text:
+                text = re.sub(r"\s*[\[(][0-9, ]+[\])]\s*", " ", text)
+                text = text.replace("•", "")
+                text = re.sub(r"http.+?\s", " ", text)
+
+            return text
+
+        def formatter(text):
+            pattern = re.compile("|".join([f"({p})" for p in Annotate.PATTERNS]))
+            text = pattern.sub(" ", text)
+            text = pattern.sub(" ", text)
+            text = re.sub(r" {2,}|\.{2,}", " ", text)
+            return re.sub(r"[^A-Za-z0-9]", "", text)
+
+        for name, baseline, function, data in [("text", text, Query.text, sections), ("formatter", formatter, Annotate.formatter, spans)]:
+            print(f"{name}: {len(data)} calls, {len(set(data))} unique")
+
+            def cached(function=function, data=data):
+                function.cache_clear()
+                for x in data:
+                    function(x)
+
+            strings = Benchmarks.timer("pattern strings", lambda baseline=baseline, data=data: [baseline(x) for x in data])
+            compiled = Benchmarks.timer("compiled", lambda function=function, data=data: [function.__wrapped__(x) for x in data])
+            cache = Benchmarks.timer("compiled + cache", cached)
+
+            print(f"Speedup: {strings / compiled:.2f}x compiled, {strings / cache:.2f}x compiled + cache")
+
+    @staticmethod
+    def update(path, vectors, articles=1000):
+        """
+        Compares an incremental index update with a full index rebuild. A copy of articles.sqlite is indexed and then the
+        entry date of articles is changed, which deletes and upserts all of their sections. Also compares deleting the
+        sections with Embeddings.delete and with Index.delete.
+
+        Args:
+            path: model path
+            vectors: path to vectors file or configuration
+            articles: number of changed articles
+        """
+
+        output = tempfile.mkdtemp()
+        shutil.copy(os.path.join(path, "articles.sqlite"), output)
+        dbfile = os.path.join(output, "articles.sqlite")
+
+        Index.run(output, vectors)
+
+        # Change articles
+        with sqlite3.connect(dbfile) as db:
+            uids = [row[0] for row in db.execute("SELECT Id FROM articles WHERE tags IS NOT NULL ORDER BY random() LIMIT ?", [articles])]
+            deletes = [row[0] for row in db.execute(f"SELECT Id FROM sections WHERE article IN ({', '.join(['?'] * len(uids))})", uids)]
+
+        # Delete sections from copies of the index
+        for name, function in [
+            ("Embeddings.delete", lambda embeddings: embeddings.delete(deletes)),
+            ("Index.delete", lambda embeddings: Index.delete(embeddings, deletes)),
+        ]:
+            embeddings = Embeddings()
+            embeddings.load(output)
+            Benchmarks.timer(f"{name} {len(deletes)} sections", lambda function=function, embeddings=embeddings: function(embeddings), 1)
+
+        with sqlite3.connect(dbfile) as db:
+            db.execute(f"UPDATE articles SET entry = '2099-01-01' WHERE id IN ({', '.join(['?'] * len(uids))})", uids)
+
+        update = Benchmarks.timer(f"update {len(uids)} articles", lambda: Index.update(output), 1)
+        rebuild = Benchmarks.timer("full rebuild", lambda: Index.run(output, vectors), 1)
+
+        print(f"Speedup: {rebuild / update:.2f}x")
+
+        shutil.rmtree(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Runs paperai benchmarks")
+    parser.add_argument("benchmark", choices=["connection", "documents", "highlights", "resolve", "terms", "text", "update"], help="benchmark to run")
+    parser.add_argument("path", nargs="?", help="model path, not required for the documents benchmark")
+    parser.add_argument("--queries", type=int, default=100, help="number of simulated queries")
+    parser.add_argument("--topn", type=int, default=50, help="number of documents per query")
+    parser.add_argument("--threshold", type=float, help="query match score threshold")
+    parser.add_argument("--vectors", help="vectors file or configuration, used by the update benchmark")
+    parser.add_argument("--articles", type=int, default=1000, help="number of changed articles, used by the update benchmark")
+    args = parser.parse_args()
+
+    if args.benchmark == "connection":
+        Benchmarks.connection(args.path, args.queries, args.topn)
+    elif args.benchmark == "documents":
+        Benchmarks.documents(topn=args.topn)
+    elif args.benchmark == "highlights":
+        Benchmarks.highlights(args.path)
+    elif args.benchmark == "resolve":
+        Benchmarks.resolve(args.path, args.queries, args.topn)
+    elif args.benchmark == "terms":
+        Benchmarks.terms(args.path, args.queries, args.topn, args.threshold)
+    elif args.benchmark == "text":
+        Benchmarks.text(args.path, args.queries, args.topn)
+    elif args.benchmark == "update":
+        Benchmarks.update(args.path, args.vectors, args.articles)
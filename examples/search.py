@@ -6,7 +6,6 @@ Requires streamlit and lxml to be installed.
 """
 
 import os
-import sqlite3
 import sys
 
 import pandas as pd
@@ -52,7 +51,7 @@ class Application:
         """
 
         dbfile = os.path.join(self.path, "articles.sqlite")
-        with sqlite3.connect(dbfile) as db:
+        with Models.connect(dbfile) as db:
             cur = db.cursor()
 
             # Query for best matches
@@ -61,17 +60,16 @@ class Application:
             # Get results grouped by document
             documents = Query.documents(results, topn)
 
+            # Get article metadata
+            metadata = Query.metadata(cur, documents, ["Title", "Published", "Publication", "Entry", "Id", "Reference"])
+
             articles = []
 
-            # Print each result, sorted by max score descending
-            for uid in sorted(documents, key=lambda k: sum(x[0] for x in documents[k]), reverse=True):
-                cur.execute(
-                    "SELECT Title, Published, Publication, Entry, Id, Reference " + "FROM articles WHERE id = ?",
-                    [uid],
-                )
-                article = cur.fetchone()
+            # Build each result, sorted by sum of scores descending
+            for uid, sections in documents.items():
+                article = metadata[uid]
 
-                matches = "<br/>".join([text for _, text in documents[uid]])
+                matches = "<br/>".join([text for _, text in sections])
 
                 title = f"<a target='_blank' href='{article[5]}'>{article[0]}</a>"
 
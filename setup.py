@@ -11,6 +11,9 @@ extras = {}
 # Development dependencies
 extras["dev"] = ["black", "coverage", "coveralls", "httpx", "pre-commit", "pylint"]
 
+# Parquet export dependencies
+extras["export"] = ["pyarrow>=14.0"]
+
 setup(
     name="paperai",
     version="2.6.0",
@@ -41,6 +44,7 @@ setup(
         "regex>=2020.5.14",
         "rich>=12.0.1",
         "scikit-learn>=0.23.1",
+        "scipy>=1.4.1",
         "skops>=0.9.0",
         "staticvectors[train]>=0.2.0",
         "text2digits>=0.1.0",
@@ -3,10 +3,11 @@ Enhanced API that also returns document metadata
 """
 
 import os
-import sqlite3
 
 import txtai.api
 
+from paperai.cache import ResultCache
+from paperai.pool import ConnectionPool
 from paperai.query import Query
 
 
@@ -15,6 +16,44 @@ class API(txtai.api.API):
     Extended API on top of txtai to return enriched query results.
     """
 
+    def __init__(self, config, loaddata=True):
+        """
+        Creates an API instance.
+
+        Args:
+            config: index configuration
+            loaddata: If True (default), load existing index data, if available. Otherwise, only load models.
+        """
+
+        super().__init__(config, loaddata)
+
+        # Pool of read-only database connections, sized with the connections setting
+        self.connections, self.cache = None, None
+        if self.config.get("path"):
+            self.connections = ConnectionPool(os.path.join(self.config["path"], "articles.sqlite"), self.config.get("connections", 8))
+
+            # Optional result cache, set cache to True or to a dict with size and ttl settings
+            cache = self.config.get("cache")
+            if cache:
+                self.cache = ResultCache(self.config["path"], **(cache if isinstance(cache, dict) else {}))
+
+    def __del__(self):
+        """
+        Closes the connection pool when this object is garbage collected.
+        """
+
+        self.close()
+        super().__del__()
+
+    def close(self):
+        """
+        Closes the connection pool.
+        """
+
+        if hasattr(self, "connections") and self.connections:
+            self.connections.close()
+            self.connections = None
+
     def search(self, query, request=None):
         """
         Extends txtai API to enrich results with content.
@@ -28,11 +67,17 @@ class API(txtai.api.API):
         """
 
         if self.embeddings:
-            dbfile = os.path.join(self.config["path"], "articles.sqlite")
             limit = self.limit(request.query_params.get("limit")) if request else 10
             threshold = float(request.query_params["threshold"]) if request and "threshold" in request.query_params else None
 
-            with sqlite3.connect(dbfile) as db:
+            # Return cached results for repeated queries
+            key = ResultCache.key(query, limit, threshold)
+            if self.cache:
+                articles = self.cache.get(key)
+                if articles is not None:
+                    return articles
+
+            with self.connections.connection() as db:
                 cur = db.cursor()
 
                 # Query for best matches
@@ -41,22 +86,17 @@ class API(txtai.api.API):
                 # Get results grouped by document
                 documents = Query.documents(results, limit)
 
+                # Get article metadata
+                metadata = Query.metadata(cur, documents, ["Title", "Published", "Publication", "Entry", "Id", "Reference"])
+
                 articles = []
 
-                # Print each result, sorted by max score descending
-                for uid in sorted(
-                    documents,
-                    key=lambda k: sum(x[0] for x in documents[k]),
-                    reverse=True,
-                ):
-                    cur.execute(
-                        "SELECT Title, Published, Publication, Entry, Id, Reference " + "FROM articles WHERE id = ?",
-                        [uid],
-                    )
-                    article = cur.fetchone()
-
-                    score = max(score for score, text in documents[uid])
-                    matches = [text for _, text in documents[uid]]
+                # Build each result, sorted by sum of scores descending
+                for uid, sections in documents.items():
+                    article = metadata[uid]
+
+                    score = max(score for score, text in sections)
+                    matches = [text for _, text in sections]
 
                     article = {
                         "id": article[4],
@@ -71,6 +111,10 @@ class API(txtai.api.API):
 
                     articles.append(article)
 
-                return articles
+            # Cache results
+            if self.cache:
+                self.cache.put(key, articles)
+
+            return articles
 
         return None
@@ -0,0 +1,149 @@
+"""
+Cache module
+"""
+
+import os
+import time
+
+from collections import OrderedDict
+from threading import Lock
+
+
+class ResultCache:
+    """
+    In-process least recently used (LRU) cache for query results. Entries expire after a time to live (TTL) and the cache
+    is cleared when the embeddings index saved in the model path changes.
+    """
+
+    # Embeddings index configuration files, txtai rewrites this file each time an index is saved
+    CONFIG = ["config.json", "config"]
+
+    def __init__(self, path, size=1024, ttl=300):
+        """
+        Creates a new result cache.
+
+        Args:
+            path: model path
+            size: maximum number of cached results
+            ttl: number of seconds results are cached, results don't expire if 0
+        """
+
+        self.path = path
+        self.size = size
+        self.ttl = ttl
+
+        # Cached results, ordered from least to most recently used
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+        # Index version the cached results were computed with
+        self.stamp = self.version()
+
+        # Cache counters
+        self.hits, self.misses = 0, 0
+
+    @staticmethod
+    def key(query, *args):
+        """
+        Builds a cache key. Whitespace in the query is normalized.
+
+        Args:
+            query: query text
+            args: additional query parameters
+
+        Returns:
+            cache key
+        """
+
+        return (" ".join(query.split()),) + args
+
+    def get(self, key):
+        """
+        Gets a cached result.
+
+        Args:
+            key: cache key
+
+        Returns:
+            cached result, None if the key isn't cached or the result expired
+        """
+
+        with self.lock:
+            self.validate()
+
+            entry = self.entries.get(key)
+            if entry and (not self.ttl or time.monotonic() - entry[0] < self.ttl):
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            # Remove expired result
+            if entry:
+                del self.entries[key]
+
+            self.misses += 1
+            return None
+
+    def put(self, key, result):
+        """
+        Caches a result. Evicts the least recently used result when the cache is full.
+
+        Args:
+            key: cache key
+            result: result to cache
+        """
+
+        with self.lock:
+            self.validate()
+
+            self.entries[key] = (time.monotonic(), result)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes all cached results.
+        """
+
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        """
+        Gets cache counters.
+
+        Returns:
+            {hits, misses, size}
+        """
+
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+    def validate(self):
+        """
+        Clears the cache when the saved embeddings index changed. This method must be called with the lock held.
+        """
+
+        stamp = self.version()
+        if stamp != self.stamp:
+            self.entries.clear()
+            self.stamp = stamp
+
+    def version(self):
+        """
+        Gets the version of the saved embeddings index, based on the modification time and size of the index
+        configuration file.
+
+        Returns:
+            index version
+        """
+
+        for name in ResultCache.CONFIG:
+            path = os.path.join(self.path, name)
+            if os.path.exists(path):
+                stat = os.stat(path)
+                return (name, stat.st_mtime_ns, stat.st_size)
+
+        return None
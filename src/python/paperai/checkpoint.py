@@ -0,0 +1,122 @@
+"""
+Checkpoint module
+"""
+
+import json
+import os
+import shutil
+
+
+class Checkpoint:
+    """
+    Index build checkpoint. Persists the term weighting scoring state at a row position in the section query stream along
+    with the vector batches already encoded. This enables resuming an interrupted index build.
+    """
+
+    # Default number of section query rows between checkpoints
+    INTERVAL = 100000
+
+    def __init__(self, path, interval, resume, parameters):
+        """
+        Creates a new checkpoint.
+
+        Args:
+            path: checkpoint directory
+            interval: number of section query rows between checkpoints, uses default interval if 0
+            resume: resumes from an existing checkpoint if True, otherwise any existing checkpoint is cleared
+            parameters: index parameters, a checkpoint can only be resumed with the same parameters
+        """
+
+        self.path = path
+        self.interval = interval if interval else Checkpoint.INTERVAL
+
+        # Fingerprint of index parameters
+        self.parameters = json.dumps(parameters, sort_keys=True, default=str)
+
+        if resume and os.path.exists(self.file("state.json")):
+            with open(self.file("state.json"), "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+            if self.state["parameters"] != self.parameters:
+                raise ValueError(f"Checkpoint in {path} was created with different index parameters")
+
+            print(f"Resuming from checkpoint at row {self.state['position']}")
+        else:
+            self.clear()
+            self.state = {"parameters": self.parameters, "position": 0, "scoring": None, "complete": False}
+
+        os.makedirs(self.path, exist_ok=True)
+
+    def file(self, name):
+        """
+        Gets the full path to a file in this checkpoint.
+
+        Args:
+            name: file name
+
+        Returns:
+            full path
+        """
+
+        return os.path.join(self.path, name)
+
+    def vectors(self):
+        """
+        Gets the checkpoint directory for encoded vector batches. Batches are written as they are encoded and are
+        read back in stream order when an index build is resumed.
+
+        Returns:
+            vectors checkpoint directory
+        """
+
+        return self.file("vectors")
+
+    def restore(self, scoring):
+        """
+        Restores scoring state from this checkpoint.
+
+        Args:
+            scoring: scoring instance
+
+        Returns:
+            row position to resume scoring at, None if scoring is complete
+        """
+
+        if self.state["scoring"]:
+            scoring.load(self.file(self.state["scoring"]))
+
+        return None if self.state["complete"] else self.state["position"]
+
+    def save(self, scoring, position=None):
+        """
+        Saves the scoring state and row position. The state file is only updated after the scoring state is fully
+        written, which keeps the last checkpoint valid if the process is interrupted.
+
+        Args:
+            scoring: scoring instance
+            position: number of section query rows processed, scoring is complete if None
+        """
+
+        # Save scoring state to a new file
+        name = f"scoring.{position if position is not None else 'complete'}"
+        scoring.save(self.file(name))
+
+        # Update state
+        previous = self.state["scoring"]
+        self.state.update({"position": position if position is not None else self.state["position"], "scoring": name, "complete": position is None})
+
+        with open(self.file("state.tmp"), "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+
+        os.replace(self.file("state.tmp"), self.file("state.json"))
+
+        # Remove previous scoring state
+        if previous and previous != name:
+            os.remove(self.file(previous))
+
+    def clear(self):
+        """
+        Deletes this checkpoint.
+        """
+
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -2,16 +2,28 @@
 Export module
 """
 
+import argparse
+import bz2
+import gzip
+import json
+import lzma
 import os
 import os.path
-import sqlite3
-import sys
 
-import regex as re
+from concurrent.futures import ProcessPoolExecutor
 
-# pylint: disable=E0611
-# Defined at runtime
-from .index import Index
+# Conditional import
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    PYARROW = True
+except ImportError:
+    PYARROW = False
+
+from .models import Models
+from .parallel import Parallel
+from .prepare import Prepare
 
 
 class Export:
@@ -19,57 +31,245 @@ class Export:
     Exports database rows into a text file line-by-line.
     """
 
+    # Compression methods - file extension and open function
+    COMPRESSION = {"gz": gzip.open, "bz2": bz2.open, "xz": lzma.open}
+
+    # Export formats
+    FORMATS = ["text", "jsonl", "parquet"]
+
+    # Number of rows read and written at a time
+    BATCH = 1000
+
     @staticmethod
-    def stream(dbfile, output):
+    def stream(dbfile, output, start=None, end=None, compression=None, kind="text"):
         """
         Iterates over each row in dbfile and writes text to output file
 
+        The text format writes section text line by line. The jsonl and parquet formats write the section id, article
+        id, name and text of each section. Rows are written in batches, which bounds memory usage.
+
         Args:
             dbfile: SQLite file to read
             output: output file to store text
+            start: optional first section id to export
+            end: optional section id to stop at, this id is not exported
+            compression: optional compression method (gz, bz2 or xz)
+            kind: export format (text, jsonl or parquet)
+
+        Returns:
+            number of lines written, number of rows for the parquet format
         """
 
-        with open(output, "w", encoding="utf-8") as out:
+        with Export.open(output, compression, kind) as out:
             # Connection to database file
-            db = sqlite3.connect(dbfile)
+            db = Models.connect(dbfile)
             cur = db.cursor()
 
-            # Get all indexed text
-            cur.execute(Index.SECTION_QUERY)
+            # Get all indexed text, filter sections in SQL when section eligibility columns are available
+            filtered = Prepare.exists(cur)
+            clauses = ["+Eligible = 1"] if filtered else []
+
+            # Filter by section id range
+            parameters = []
+            if start is not None:
+                clauses.append("Id >= ?")
+                parameters.append(start)
+            if end is not None:
+                clauses.append("Id < ?")
+                parameters.append(end)
+
+            cur.execute("SELECT Id, Article, Name, Text FROM sections" + (f" WHERE {' AND '.join(clauses)}" if clauses else ""), parameters)
 
-            count = 0
-            for _, name, text in cur:
-                if not name or not re.search(Index.SECTION_FILTER, name.lower()):
-                    count += 1
-                    if count % 1000 == 0:
-                        print(f"Streamed {count} documents", end="\r")
+            count, lines = 0, 0
+            for rows in Parallel.chunks(cur, Export.BATCH):
+                rows = [row for row in rows if filtered or Prepare.eligible(row[2])]
 
-                    # Write row
-                    if text:
-                        out.write(text + "\n")
+                # Write rows
+                lines += Export.write(out, rows, kind)
+
+                count += len(rows)
+                print(f"Streamed {count} documents", end="\r")
 
             print(f"Iterated over {count} total rows")
 
             # Free database resources
             db.close()
 
+        return lines
+
     @staticmethod
-    def run(output, path):
+    def open(output, compression=None, kind="text"):
+        """
+        Opens an output file for writing.
+
+        Args:
+            output: output file path
+            compression: optional compression method (gz, bz2 or xz)
+            kind: export format (text, jsonl or parquet)
+
+        Returns:
+            file object or parquet writer
+        """
+
+        if compression and compression not in Export.COMPRESSION:
+            raise ValueError(f"Unsupported compression method: {compression}")
+
+        if kind not in Export.FORMATS:
+            raise ValueError(f"Unsupported export format: {kind}")
+
+        # Parquet files compress column data internally
+        if kind == "parquet":
+            if not PYARROW:
+                raise ImportError('Parquet export is not available - install "export" extra to enable')
+
+            if compression not in (None, "gz"):
+                raise ValueError(f"Unsupported parquet compression method: {compression}")
+
+            return pq.ParquetWriter(output, Export.schema(), compression="gzip" if compression else "snappy")
+
+        if compression:
+            return Export.COMPRESSION[compression](output, "wt", encoding="utf-8")
+
+        return open(output, "w", encoding="utf-8")
+
+    @staticmethod
+    def write(out, rows, kind):
+        """
+        Writes a batch of rows.
+
+        Args:
+            out: output file object or parquet writer
+            rows: list of (id, article, name, text) rows
+            kind: export format (text, jsonl or parquet)
+
+        Returns:
+            number of lines written, number of rows for the parquet format
+        """
+
+        lines = 0
+
+        if kind == "parquet":
+            if rows:
+                columns = list(zip(*rows))
+                out.write_table(pa.Table.from_arrays([pa.array(column) for column in columns], schema=Export.schema()))
+
+            lines = len(rows)
+
+        elif kind == "jsonl":
+            for uid, article, name, text in rows:
+                out.write(json.dumps({"id": uid, "article": article, "name": name, "text": text}) + "\n")
+
+            lines = len(rows)
+
+        else:
+            for _, _, _, text in rows:
+                if text:
+                    out.write(text + "\n")
+                    lines += text.count("\n") + 1
+
+        return lines
+
+    @staticmethod
+    def schema():
+        """
+        Gets the parquet export schema.
+
+        Returns:
+            pyarrow schema
+        """
+
+        return pa.schema([("id", pa.int64()), ("article", pa.string()), ("name", pa.string()), ("text", pa.string())])
+
+    @staticmethod
+    def bounds(dbfile, shards):
+        """
+        Splits sections into shards by section id range. Each shard has close to the same number of sections.
+
+        Args:
+            dbfile: SQLite file to read
+            shards: number of shards
+
+        Returns:
+            list of (start, end) section id ranges, end is None for the last shard
+        """
+
+        # Connection to database file
+        db = Models.connect(dbfile)
+        count = db.execute("SELECT count(*) FROM sections").fetchone()[0]
+
+        # First section id of each shard
+        starts = []
+        for x in range(shards):
+            row = db.execute("SELECT Id FROM sections ORDER BY Id LIMIT 1 OFFSET ?", [(count * x) // shards]).fetchone()
+            starts.append(row[0] if row else None)
+
+        # Free database resources
+        db.close()
+
+        # Drop empty shards
+        starts = sorted({start for start in starts if start is not None})
+        return list(zip(starts, starts[1:] + [None])) if starts else [(None, None)]
+
+    @staticmethod
+    def run(output, path, shards=0, compression=None, kind="text"):
         """
         Exports data from database to text file, line by line.
 
+        When shards is set, sections are split by section id range and each shard is written to a separate file in
+        parallel. A manifest with the file name, section id range and line count of each shard is written alongside
+        the shards.
+
         Args:
             output: output file path
             path: model path, if None uses default path
+            shards: number of output shards, writes a single file if 0
+            compression: optional compression method (gz, bz2 or xz)
+            kind: export format (text, jsonl or parquet)
         """
 
         # Derive path to dbfile
         dbfile = os.path.join(path, "articles.sqlite")
 
+        # Add compression extension, parquet files compress column data internally
+        extension = f".{compression}" if compression and kind != "parquet" else ""
+
         # Stream text from database to file
-        Export.stream(dbfile, output)
+        if not shards:
+            Export.stream(dbfile, output + extension, compression=compression, kind=kind)
+            return
+
+        # Stream shards from database to files in parallel
+        root, ext = os.path.splitext(output)
+        bounds = Export.bounds(dbfile, shards)
+        files = [f"{root}-{x:05d}{ext}{extension}" for x in range(len(bounds))]
+
+        with ProcessPoolExecutor(len(bounds)) as executor:
+            futures = [executor.submit(Export.stream, dbfile, name, start, end, compression, kind) for name, (start, end) in zip(files, bounds)]
+            lines = [future.result() for future in futures]
+
+        # Write manifest
+        manifest = {
+            "format": kind,
+            "compression": compression,
+            "lines": sum(lines),
+            "shards": [
+                {"file": os.path.basename(name), "start": start, "end": end, "lines": count}
+                for name, (start, end), count in zip(files, bounds, lines)
+            ],
+        }
+
+        with open(f"{root}.manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exports section text from a paperai database")
+    parser.add_argument("output", help="output file path")
+    parser.add_argument("path", nargs="?", help="model path")
+    parser.add_argument("--shards", type=int, default=0, help="number of output shards written in parallel")
+    parser.add_argument("--compression", choices=list(Export.COMPRESSION), help="output compression method")
+    parser.add_argument("--format", choices=Export.FORMATS, default="text", help="export format")
+    args = parser.parse_args()
+
     # Export data
-    Export.run(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    Export.run(args.output, args.path, args.shards, args.compression, args.format)
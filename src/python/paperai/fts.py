@@ -0,0 +1,271 @@
+"""
+FTS module
+"""
+
+import os
+import os.path
+import sqlite3
+
+from itertools import islice
+
+
+class FTS:
+    """
+    Full text index over the text of indexed sections. The full text index is a fts.sqlite file alongside articles.sqlite
+    with a FTS5 table keyed by section id. The trigram tokenizer supports the same case-insensitive substring matching as
+    the +required and -prohibited query term syntax. Section text is stored in the table, which allows deleting sections
+    when an index is updated.
+    """
+
+    # Full text index file name
+    FILE = "fts.sqlite"
+
+    # Maximum number of sections matching the required terms of a query that are ranked directly
+    LIMIT = 1000
+
+    # Minimum term length supported by the trigram tokenizer
+    MINLENGTH = 3
+
+    # Maximum number of ids per IN query, kept below the SQLite bound variable limit
+    BATCH = 999
+
+    @staticmethod
+    def build(path, rows, batch=1000):
+        """
+        Builds a full text index. The index is written to a temporary file and moved into place when complete.
+
+        Args:
+            path: model path
+            rows: iterable of (section id, text) rows
+            batch: number of rows inserted at a time
+        """
+
+        output = os.path.join(path, FTS.FILE)
+        temp = f"{output}.tmp"
+
+        if os.path.exists(temp):
+            os.remove(temp)
+
+        # Connection to full text index file
+        db = sqlite3.connect(temp)
+        db.execute("CREATE VIRTUAL TABLE sections USING fts5(Text, tokenize='trigram')")
+
+        count = FTS.insert(db, rows, batch)
+
+        # Merge index segments
+        db.execute("INSERT INTO sections(sections) VALUES ('optimize')")
+        db.commit()
+
+        print(f"Built full text index with {count} sections")
+
+        # Free database resources
+        db.close()
+
+        os.replace(temp, output)
+
+    @staticmethod
+    def update(path, deletes, rows, batch=1000):
+        """
+        Updates a full text index. Deletes sections and upserts new and changed sections. Changes are written in a single
+        transaction.
+
+        Args:
+            path: model path
+            deletes: list of section ids to delete
+            rows: iterable of (section id, text) rows to upsert
+            batch: number of rows upserted at a time
+        """
+
+        # Connection to full text index file
+        db = sqlite3.connect(os.path.join(path, FTS.FILE))
+
+        FTS.delete(db, deletes)
+        count = FTS.insert(db, rows, batch, True)
+        db.commit()
+
+        print(f"Updated full text index, {len(deletes)} sections deleted, {count} sections upserted")
+
+        # Free database resources
+        db.close()
+
+    @staticmethod
+    def insert(db, rows, batch, upsert=False):
+        """
+        Inserts rows into a full text index.
+
+        Args:
+            db: full text index connection
+            rows: iterable of (section id, text) rows
+            batch: number of rows inserted at a time
+            upsert: deletes existing rows with the same section ids first if True
+
+        Returns:
+            number of rows inserted
+        """
+
+        rows, count = iter(rows), 0
+        for chunk in iter(lambda: list(islice(rows, batch)), []):
+            if upsert:
+                FTS.delete(db, [uid for uid, _ in chunk])
+
+            db.executemany("INSERT INTO sections(rowid, Text) VALUES (?, ?)", chunk)
+
+            count += len(chunk)
+            print(f"Indexed {count} sections", end="\r")
+
+        return count
+
+    @staticmethod
+    def delete(db, ids):
+        """
+        Deletes rows from a full text index.
+
+        Args:
+            db: full text index connection
+            ids: list of section ids
+        """
+
+        ids = list(ids)
+        for x in range(0, len(ids), FTS.BATCH):
+            batch = ids[x : x + FTS.BATCH]
+            db.execute(f"DELETE FROM sections WHERE rowid IN ({', '.join(['?'] * len(batch))})", batch)
+
+    @staticmethod
+    def exists(path):
+        """
+        Checks if a full text index exists.
+
+        Args:
+            path: model path
+
+        Returns:
+            True if the full text index exists, False otherwise
+        """
+
+        return os.path.exists(os.path.join(path, FTS.FILE))
+
+    @staticmethod
+    def attach(cur, dbfile):
+        """
+        Attaches the full text index for dbfile as the fts schema, if it exists.
+
+        Args:
+            cur: database cursor or connection
+            dbfile: articles.sqlite file
+
+        Returns:
+            True if the full text index is attached, False otherwise
+        """
+
+        if FTS.attached(cur):
+            return True
+
+        path = os.path.dirname(dbfile)
+        if FTS.exists(path):
+            cur.execute("ATTACH DATABASE ? AS fts", [os.path.join(path, FTS.FILE)])
+            return True
+
+        return False
+
+    @staticmethod
+    def attached(cur):
+        """
+        Checks if the full text index is attached.
+
+        Args:
+            cur: database cursor or connection
+
+        Returns:
+            True if the full text index is attached, False otherwise
+        """
+
+        return any(row[1] == "fts" for row in cur.execute("PRAGMA database_list"))
+
+    @staticmethod
+    def supported(terms):
+        """
+        Checks if the full text index can match all terms. The trigram tokenizer can't match terms shorter than 3
+        characters.
+
+        Args:
+            terms: list of terms
+
+        Returns:
+            True if all terms are supported, False otherwise
+        """
+
+        return all(len(term) >= FTS.MINLENGTH for term in terms)
+
+    @staticmethod
+    def match(cur, must, mnot):
+        """
+        Finds sections that contain all required terms and none of the prohibited terms.
+
+        Args:
+            cur: database cursor or connection
+            must: required terms
+            mnot: prohibited terms
+
+        Returns:
+            list of section ids, None if there are no required terms, a term isn't supported or more than FTS.LIMIT
+            sections match
+        """
+
+        if not must or not FTS.supported(must + mnot):
+            return None
+
+        expression = " AND ".join(FTS.quote(term) for term in must)
+        if mnot:
+            expression += f" NOT ({' OR '.join(FTS.quote(term) for term in mnot)})"
+
+        ids = [row[0] for row in cur.execute("SELECT rowid FROM fts.sections WHERE sections MATCH ? LIMIT ?", [expression, FTS.LIMIT + 1])]
+        return ids if len(ids) <= FTS.LIMIT else None
+
+    @staticmethod
+    def filter(cur, ids, must, mnot):
+        """
+        Filters a list of section ids to sections that contain all required terms and none of the prohibited terms.
+
+        Args:
+            cur: database cursor or connection
+            ids: list of section ids
+            must: required terms
+            mnot: prohibited terms
+
+        Returns:
+            set of matching section ids, None if a term isn't supported
+        """
+
+        if not FTS.supported(must + mnot):
+            return None
+
+        matches = set(ids)
+        for terms, operator, required in [(must, " AND ", True), (mnot, " OR ", False)]:
+            if terms and matches:
+                expression = operator.join(FTS.quote(term) for term in terms)
+
+                found, ids = set(), list(matches)
+                for x in range(0, len(ids), FTS.BATCH):
+                    batch = ids[x : x + FTS.BATCH]
+                    rows = cur.execute(
+                        f"SELECT rowid FROM fts.sections WHERE sections MATCH ? AND rowid IN ({', '.join(['?'] * len(batch))})", [expression] + batch
+                    )
+                    found.update(row[0] for row in rows)
+
+                matches = matches & found if required else matches - found
+
+        return matches
+
+    @staticmethod
+    def quote(term):
+        """
+        Quotes a term as an FTS5 string.
+
+        Args:
+            term: input term
+
+        Returns:
+            quoted term
+        """
+
+        return '"' + term.replace('"', '""') + '"'
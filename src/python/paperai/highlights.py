@@ -5,9 +5,13 @@ Highlights module
 import itertools
 
 import networkx
+import numpy as np
 
+from scipy import sparse
 from txtai.pipeline import Tokenizer
 
+from .minhash import MinHash
+
 
 class Highlights:
     """
@@ -60,85 +64,121 @@ class Highlights:
         "using",
     }
 
+    # TextRank implementation, sparse runs with scipy sparse matrices, networkx builds a networkx graph
+    BACKEND = "sparse"
+
+    # PageRank parameters, same as the networkx defaults
+    ALPHA, MAXITER, TOLERANCE = 0.85, 100, 1.0e-6
+
+    # Finds repetitive highlights with MinHash LSH buckets instead of comparing against each prior highlight, if True
+    MINHASH = False
+
+    # LSH bands, bands of 2 hashes find sections above the 0.2 Jaccard uniqueness threshold with high probability
+    BANDS = 64
+
     @staticmethod
-    def build(sections, topn):
+    def build(sections, topn, tokens=None, minhash=None, signatures=None):
         """
         Extracts highlights from a list of sections. This method uses textrank to find sections with the highest
         importance across the input list. This method attempts to return important but unique results to limit
         repetitive statements.
 
+        With MinHash enabled, each section is only compared against prior highlights that share a LSH bucket. This is
+        approximate, a repetitive section is occasionally missed.
+
         Args:
             sections: input sections
             topn: top n results to return
+            tokens: optional dict of cached tokens by section id
+            minhash: finds repetitive sections with MinHash LSH if True, defaults to Highlights.MINHASH
+            signatures: optional dict of cached MinHash signatures by section id
 
         Results:
             top n sections
         """
 
-        results = []
+        # Tokenize each section once, tokens are shared by textrank and the uniqueness check
+        terms = Highlights.terms(sections, tokens)
+
+        results = {}
+
+        # LSH index of results
+        index = MinHash(Highlights.BANDS) if (minhash if minhash is not None else Highlights.MINHASH) else None
+        signatures = signatures if signatures else {}
 
         # Rank the text using textrank for importance within collection
-        for uid, _ in Highlights.textrank(sections):
-            # Lookup text and tokenize
-            text = [text for u, text in sections if u == uid][0]
-            tokens = Highlights.tokenize(text)
+        for uid, _ in Highlights.textrank(sections, terms=terms):
+            # Get results to compare, limited to candidates sharing a LSH bucket when enabled
+            if index:
+                signature = signatures[uid] if uid in signatures else MinHash.signature(terms[uid])
+                candidates = index.query(signature)
+            else:
+                candidates = results
 
             # Compare text to existing results, look for highly unique results
             # This finds results that are important but not repetitive
-            unique = all(Highlights.jaccardIndex(t, tokens) <= 0.2 for _, t in results)
+            unique = all(Highlights.jaccardIndex(results[candidate], terms[uid]) <= 0.2 for candidate in candidates)
             if unique:
-                results.append((uid, tokens))
+                results[uid] = terms[uid]
+                if index:
+                    index.insert(uid, signature)
 
-        uids = [uid for uid, _ in results][:topn]
+                # Stop once topn unique results are found
+                if len(results) == topn:
+                    break
 
         # Get related text for each match
-        return [text for uid, text in sections if uid in uids]
+        return [text for uid, text in sections if uid in results]
 
     @staticmethod
-    def textrank(sections):
+    def textrank(sections, tokens=None, backend=None, terms=None):
         """
         Runs the textrank algorithm against the list of sections. Orders the list into descending order of importance
         given the list.
 
         Args:
             sections: list of sentences
+            tokens: optional dict of cached tokens by section id
+            backend: textrank implementation (sparse or networkx), defaults to Highlights.BACKEND
+            terms: optional dict of section tokens by section id, as returned by Highlights.terms
 
         Returns:
             sorted list using the textrank algorithm
         """
 
-        # Build the graph network
-        graph = Highlights.buildGraph(sections)
+        # Tokenize sections
+        terms = terms if terms is not None else Highlights.terms(sections, tokens)
+
+        if (backend if backend else Highlights.BACKEND) == "sparse":
+            # Run pagerank over a sparse similarity matrix
+            rank = dict(zip(terms, map(float, Highlights.pagerank(Highlights.buildMatrix(terms)))))
+        else:
+            # Build the graph network
+            graph = Highlights.buildGraph(terms)
 
-        # Run pagerank
-        rank = networkx.pagerank(graph, weight="weight")
+            # Run pagerank
+            rank = networkx.pagerank(graph, weight="weight")
 
         # Return items sorted by highest score first
         return sorted(list(rank.items()), key=lambda x: x[1], reverse=True)
 
     @staticmethod
-    def buildGraph(nodes):
+    def buildGraph(terms):
         """
         Builds a graph of nodes using input.
 
         Args:
-            nodes: input graph nodes
+            terms: dict of tokens by node id
 
         Returns:
             graph
         """
 
         graph = networkx.Graph()
-        graph.add_nodes_from([uid for (uid, _) in nodes])
-
-        # Tokenize nodes, store uid and tokens
-        vectors = []
-        for uid, text in nodes:
-            # Custom tokenization that works best with textrank matching
-            tokens = Highlights.tokenize(text)
+        graph.add_nodes_from(terms)
 
-            if len(tokens) >= 3:
-                vectors.append((uid, tokens))
+        # Store uid and tokens for nodes with at least 3 tokens
+        vectors = [(uid, tokens) for uid, tokens in terms.items() if len(tokens) >= 3]
 
         pairs = list(itertools.combinations(vectors, 2))
 
@@ -152,6 +192,94 @@ class Highlights:
 
         return graph
 
+    @staticmethod
+    def buildMatrix(terms):
+        """
+        Builds a sparse matrix of Jaccard similarity scores between nodes. Pairwise token intersections are calculated
+        with a product of a binary node-token incidence matrix. Nodes with less than 3 tokens have no edges.
+
+        Args:
+            terms: dict of tokens by node id
+
+        Returns:
+            sparse similarity matrix, rows and columns are in the iteration order of terms
+        """
+
+        # Build node-token incidence matrix
+        rows, columns, vocabulary = [], [], {}
+        for x, tokens in enumerate(terms.values()):
+            if len(tokens) >= 3:
+                rows.extend([x] * len(tokens))
+                columns.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+
+        size = len(terms)
+        incidence = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(size, len(vocabulary)))
+
+        # Number of shared tokens for each pair of nodes
+        intersection = (incidence @ incidence.T).tocoo()
+        counts = np.asarray(incidence.sum(axis=1)).ravel()
+
+        # Jaccard index = intersection / union, excluding self similarity
+        mask = intersection.row != intersection.col
+        row, col, shared = intersection.row[mask], intersection.col[mask], intersection.data[mask]
+        scores = shared / (counts[row] + counts[col] - shared)
+
+        return sparse.csr_matrix((scores, (row, col)), shape=(size, size))
+
+    @staticmethod
+    def pagerank(matrix):
+        """
+        Runs pagerank by power iteration over a sparse similarity matrix. Follows the networkx implementation. Edges
+        with a weight of 0 don't contribute to a node's rank and nodes without weighted edges are dangling nodes,
+        which distribute their rank uniformly.
+
+        Args:
+            matrix: sparse similarity matrix
+
+        Returns:
+            array of pagerank scores
+        """
+
+        size = matrix.shape[0]
+        if not size:
+            return np.array([])
+
+        # Normalize rows into transition probabilities
+        weights = np.asarray(matrix.sum(axis=1)).ravel()
+        dangling = weights == 0
+        weights[~dangling] = 1.0 / weights[~dangling]
+        matrix = sparse.diags(weights) @ matrix
+
+        # Uniform starting, teleport and dangling node distributions
+        x = np.full(size, 1.0 / size)
+        p = np.full(size, 1.0 / size)
+
+        for _ in range(Highlights.MAXITER):
+            last = x
+            x = Highlights.ALPHA * (x @ matrix + x[dangling].sum() * p) + (1 - Highlights.ALPHA) * p
+
+            # Check convergence, l1 norm
+            if np.absolute(x - last).sum() < size * Highlights.TOLERANCE:
+                return x
+
+        raise networkx.PowerIterationFailedConvergence(Highlights.MAXITER)
+
+    @staticmethod
+    def terms(sections, tokens=None):
+        """
+        Tokenizes a list of sections.
+
+        Args:
+            sections: input sections
+            tokens: optional dict of cached tokens by section id
+
+        Returns:
+            dict of tokens by section id
+        """
+
+        # Custom tokenization that works best with textrank matching
+        return {uid: Highlights.tokenize(text, tokens.get(uid) if tokens else None) for uid, text in sections}
+
     @staticmethod
     def jaccardIndex(set1, set2):
         """
@@ -169,16 +297,18 @@ class Highlights:
         return n / float(len(set1) + len(set2) - n) if n > 0 else 0
 
     @staticmethod
-    def tokenize(text):
+    def tokenize(text, tokens=None):
         """
         Tokenizes text into tokens, removes domain specific stop words.
 
         Args:
             text: input text
+            tokens: optional cached tokens for text
 
         Returns:
             tokens
         """
 
         # Remove additional stop words to improve highlighting results
-        return {token for token in Tokenizer.tokenize(text) if token not in Highlights.STOP_WORDS}
+        tokens = tokens if tokens is not None else Tokenizer.tokenize(text)
+        return {token for token in tokens if token not in Highlights.STOP_WORDS}
@@ -2,17 +2,79 @@
 Indexing module
 """
 
+import argparse
 import os.path
 import sqlite3
-import sys
 
-import regex as re
+from concurrent.futures import ProcessPoolExecutor
+
 import yaml
 
 from txtai.embeddings import Embeddings
-from txtai.pipeline import Tokenizer
 from txtai.vectors import WordVectors
 
+from .checkpoint import Checkpoint
+from .fts import FTS
+from .manifest import Manifest
+from .parallel import Parallel
+from .prepare import Prepare
+from .shards import Shards
+from .spill import Spill
+from .vectors import Vectors
+
+
+class IndexEmbeddings(Embeddings):
+    """
+    Embeddings index used for incremental updates. Embeddings.delete scans all index ids once per deleted id when content
+    storage is disabled and Embeddings.upsert runs a delete for each batch. Deletes instead run in a single pass with
+    Index.delete and upsert batches only delete ids already in the index.
+    """
+
+    def __init__(self, config=None, models=None, **kwargs):
+        super().__init__(config, models, **kwargs)
+
+        # Set of index ids, only set while an upsert runs
+        self.existing = None
+
+    def upsert(self, documents, checkpoint=None):
+        """
+        Upserts documents. Upserted ids are checked against a set of the current index ids, which is built once.
+
+        Args:
+            documents: iterable of (id, data, tags)
+            checkpoint: optional checkpoint directory
+        """
+
+        # Content storage looks up ids in the database
+        if not self.database:
+            self.existing = {uid for uid in self.ids if uid is not None} if self.ids else set()
+
+        try:
+            super().upsert(documents, checkpoint)
+        finally:
+            self.existing = None
+
+    def delete(self, ids):
+        """
+        Deletes ids from this index.
+
+        Args:
+            ids: list of ids to delete
+
+        Returns:
+            list of ids deleted
+        """
+
+        # Content storage looks up ids in the database
+        if self.database:
+            return super().delete(ids)
+
+        # Skip ids not in the index while an upsert runs
+        if self.existing is not None:
+            ids = [uid for uid in ids if uid in self.existing]
+
+        return Index.delete(self, ids) if ids else []
+
 
 class Index:
     """
@@ -20,60 +82,190 @@ class Index:
     """
 
     # Section query and filtering logic constants
-    SECTION_FILTER = r"background|(?<!.*?results.*?)discussion|introduction|reference"
+    SECTION_FILTER = Prepare.SECTION_FILTER
     SECTION_QUERY = "SELECT Id, Name, Text FROM sections"
 
     @staticmethod
-    def stream(dbfile, maxsize, toprank, scoring):
+    def stream(dbfile, maxsize, toprank, scoring, workers=0, chunksize=1000, articles=None, offset=0):
         """
         Streams documents from an articles.sqlite file. This method is a generator and will yield a row at time.
 
+        Rows are read in chunks. When workers is set, each chunk is filtered and tokenized in a pool of worker processes.
+        Documents are yielded in the same order as the rows are read.
+
         Args:
             dbfile: input SQLite file
             maxsize: maximum number of documents to process
             toprank: only index the topn ranked articles by citation count within the dataset
             scoring: True if index uses a scoring model, False otherwise
+            workers: number of worker processes used to filter and tokenize rows, runs in current process if 0
+            chunksize: number of rows per chunk
+            articles: optional list of article ids, only streams sections for these articles when set
+            offset: number of section query rows to skip
+        """
+
+        count = 0
+        for documents in Index.chunks(dbfile, maxsize, toprank, scoring, workers, chunksize, articles, offset):
+            for document in documents:
+                count += 1
+                if count % 1000 == 0:
+                    print(f"Streamed {count} documents", end="\r")
+
+                # Skip documents with no tokens parsed
+                if document[1]:
+                    yield document
+
+        print(f"Iterated over {count} total rows")
+
+    @staticmethod
+    def chunks(dbfile, maxsize, toprank, scoring, workers=0, chunksize=1000, articles=None, offset=0):
+        """
+        Streams chunks of documents from an articles.sqlite file. This method is a generator and will yield a list of
+        documents for each chunk of chunksize section query rows. Documents with no tokens parsed are included.
+
+        Args:
+            dbfile: input SQLite file
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+            scoring: True if index uses a scoring model, False otherwise
+            workers: number of worker processes used to filter and tokenize rows, runs in current process if 0
+            chunksize: number of rows per chunk
+            articles: optional list of article ids, only streams sections for these articles when set
+            offset: number of section query rows to skip
         """
 
         # Connection to database file
         db = sqlite3.connect(dbfile)
         cur = db.cursor()
 
-        # Select sections from tagged articles
-        query = Index.SECTION_QUERY + " WHERE article in (SELECT article FROM articles a WHERE a.id = article AND a.tags IS NOT NULL)"
+        # Attach token cache, if available
+        if scoring:
+            Prepare.attach(cur, dbfile)
 
-        if maxsize > 0:
-            query += f" AND article in (SELECT id FROM articles ORDER BY entry DESC LIMIT {maxsize})"
+        # Build section query
+        query, filtered = Index.query(cur, maxsize, toprank, scoring, articles)
 
-        if toprank > 0:
-            query += f" AND article in (SELECT reference FROM citations GROUP BY reference ORDER BY count(*) DESC LIMIT {toprank})"
+        # Skip rows up to offset
+        if offset > 0:
+            query += f" LIMIT -1 OFFSET {offset}"
 
         # Run the query
         cur.execute(query)
 
-        count = 0
-        for row in cur:
-            # Unpack row
-            uid, name, text = row
+        yield from Parallel.map(Index.documents, Parallel.chunks(cur, chunksize), workers, (scoring, filtered))
 
-            if not scoring or not name or not re.search(Index.SECTION_FILTER, name.lower()):
-                # Tokenize text
-                text = Tokenizer.tokenize(text) if scoring else text
+        # Free database resources
+        db.close()
 
-                document = (uid, text, None)
+    @staticmethod
+    def query(cur, maxsize, toprank, scoring, articles=None):
+        """
+        Builds a query that selects sections from articles eligible for indexing. Eligible article ids are stored in
+        an indexed temporary table, which sections are joined against. Cached tokens are selected when the token cache
+        is attached.
 
-                count += 1
-                if count % 1000 == 0:
-                    print(f"Streamed {count} documents", end="\r")
+        Args:
+            cur: database cursor
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+            scoring: True if index uses a scoring model, False otherwise
+            articles: optional list of article ids, only selects sections for these articles when set
 
-                # Skip documents with no tokens parsed
-                if text:
-                    yield document
+        Returns:
+            (section query that selects (id, name, text, cached tokens) rows, True if sections are filtered in SQL)
+        """
 
-        print(f"Iterated over {count} total rows")
+        # Store eligible article ids
+        Index.eligible(cur, maxsize, toprank, articles)
 
-        # Free database resources
-        db.close()
+        # Select sections from eligible articles along with cached tokens
+        if scoring and Prepare.attached(cur):
+            query = "SELECT Id, Name, Text, Terms FROM sections JOIN temp.indexed USING (Article) LEFT JOIN tokens.tokens USING (Id)"
+        else:
+            query = "SELECT Id, Name, Text, NULL FROM sections JOIN temp.indexed USING (Article)"
+
+        # Filter sections in SQL when section eligibility columns are available. Unary + operators keep a section id
+        # order scan, most sections are eligible and reading them through the eligibility index requires a sort.
+        filtered = scoring and Prepare.exists(cur)
+        if filtered:
+            query += " WHERE +Eligible = 1 AND +Tokens > 0"
+
+        # Sort by section id, keeps the same row order for all filters
+        query += " ORDER BY Id"
+
+        return query, filtered
+
+    @staticmethod
+    def eligible(cur, maxsize, toprank, articles=None):
+        """
+        Stores the ids of articles eligible for indexing in the temporary table indexed.
+
+        Args:
+            cur: database cursor
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+            articles: optional list of article ids, only stores these articles when set
+        """
+
+        query = Index.articles(maxsize, toprank)
+
+        # Restrict to list of articles
+        if articles is not None:
+            cur.execute("CREATE TEMP TABLE subset (Id TEXT PRIMARY KEY)")
+            cur.executemany("INSERT OR IGNORE INTO temp.subset VALUES (?)", [(uid,) for uid in articles])
+            query += " AND id IN (SELECT id FROM temp.subset)"
+
+        cur.execute("CREATE TEMP TABLE indexed (Article TEXT PRIMARY KEY)")
+        cur.execute(f"INSERT INTO temp.indexed {query}")
+
+    @staticmethod
+    def articles(maxsize, toprank):
+        """
+        Builds a query that selects the ids of articles eligible for indexing. The maxsize and toprank subqueries
+        are not correlated and only run once.
+
+        Args:
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+
+        Returns:
+            article id query
+        """
+
+        # Select tagged articles
+        query = "SELECT Id FROM articles WHERE tags IS NOT NULL"
+
+        if maxsize > 0:
+            query += f" AND id IN (SELECT id FROM articles ORDER BY entry DESC LIMIT {maxsize})"
+
+        if toprank > 0:
+            query += f" AND id IN (SELECT reference FROM citations GROUP BY reference ORDER BY count(*) DESC LIMIT {toprank})"
+
+        return query
+
+    @staticmethod
+    def documents(rows, scoring, filtered=False):
+        """
+        Filters and tokenizes a chunk of section rows.
+
+        Args:
+            rows: list of (id, name, text, cached tokens) rows
+            scoring: True if index uses a scoring model, False otherwise
+            filtered: True if rows are already filtered in SQL, skips section name filtering
+
+        Returns:
+            list of (id, text, None) documents
+        """
+
+        documents = []
+        for uid, name, text, terms in rows:
+            if not scoring or filtered or Prepare.eligible(name):
+                # Tokenize text
+                text = Prepare.tokenize(text, terms) if scoring else text
+
+                documents.append((uid, text, None))
+
+        return documents
 
     @staticmethod
     def config(vectors):
@@ -104,7 +296,7 @@ class Index:
         return {"path": vectors} if vectors else None
 
     @staticmethod
-    def embeddings(dbfile, vectors, maxsize, toprank):
+    def embeddings(dbfile, vectors, maxsize, toprank, workers=0, chunksize=1000, spill=False, checkpoint=None):
         """
         Builds a vector embeddings index.
 
@@ -113,6 +305,10 @@ class Index:
             vectors: path to vectors file or configuration
             maxsize: maximum number of documents to process
             toprank: only index the topn ranked articles by citation count within the dataset
+            workers: number of worker processes used to filter and tokenize rows
+            chunksize: number of rows per worker chunk
+            spill: if True, scoring indexes tokenize documents once into a spill cache that is replayed to build the index
+            checkpoint: optional Checkpoint, enables resuming an interrupted index build, spill is ignored when set
 
         Returns:
             embeddings index
@@ -122,17 +318,205 @@ class Index:
         embeddings = Embeddings(Index.config(vectors))
         scoring = embeddings.isweighted()
 
+        # Build scoring index and embeddings index with periodic checkpoints
+        if checkpoint:
+            if scoring:
+                Index.scoring(embeddings, dbfile, maxsize, toprank, workers, chunksize, checkpoint)
+
+            embeddings.index(Index.stream(dbfile, maxsize, toprank, scoring, workers, chunksize), checkpoint=checkpoint.vectors())
+            return embeddings
+
+        # Build scoring index and embeddings index from a single pass over the database
+        if scoring and spill:
+            with Spill() as cache:
+                embeddings.score(cache(Index.stream(dbfile, maxsize, toprank, scoring, workers, chunksize)))
+                embeddings.index(cache)
+
+            return embeddings
+
         # Build scoring index if scoring method provided
         if scoring:
-            embeddings.score(Index.stream(dbfile, maxsize, toprank, scoring))
+            embeddings.score(Index.stream(dbfile, maxsize, toprank, scoring, workers, chunksize))
 
         # Build embeddings index
-        embeddings.index(Index.stream(dbfile, maxsize, toprank, scoring))
+        embeddings.index(Index.stream(dbfile, maxsize, toprank, scoring, workers, chunksize))
 
         return embeddings
 
     @staticmethod
-    def run(path, vectors, maxsize=0, toprank=0):
+    def scoring(embeddings, dbfile, maxsize, toprank, workers, chunksize, checkpoint):
+        """
+        Builds a term weighting scoring index with periodic checkpoints. The scoring state is saved every checkpoint
+        interval section query rows. Scoring resumes at the last saved row position.
+
+        Args:
+            embeddings: embeddings index
+            dbfile: input SQLite file
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+            workers: number of worker processes used to filter and tokenize rows
+            chunksize: number of rows per worker chunk
+            checkpoint: Checkpoint
+        """
+
+        # Restore scoring state and row position
+        position = checkpoint.restore(embeddings.scoring)
+        if position is None:
+            return
+
+        if position:
+            print(f"Resuming scoring at row {position}")
+
+        last = position
+        for documents in Index.chunks(dbfile, maxsize, toprank, True, workers, chunksize, offset=position):
+            # Skip documents with no tokens parsed
+            embeddings.scoring.insert([document for document in documents if document[1]])
+
+            # Save checkpoint
+            position += chunksize
+            if position - last >= checkpoint.interval:
+                checkpoint.save(embeddings.scoring, position)
+                last = position
+
+        # Build scoring index and save final scoring state
+        embeddings.scoring.index()
+        checkpoint.save(embeddings.scoring)
+
+    @staticmethod
+    def sharded(path, vectors, maxsize, toprank, shards, workers=0, chunksize=1000):
+        """
+        Builds a vector embeddings index from shards. Eligible articles are split by article id range into shards and
+        each shard is encoded in a separate process. Shard vectors are then merged into a single embeddings index.
+
+        Shards that are already complete are not encoded again. This allows resuming an interrupted build and encoding
+        shards on other machines that share the model path, see Index.shard.
+
+        Args:
+            path: model path
+            vectors: path to vectors file or configuration
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+            shards: number of shards
+            workers: number of worker processes used to filter and tokenize rows in each shard
+            chunksize: number of rows per worker chunk
+
+        Returns:
+            embeddings index
+        """
+
+        # Create shard plan and shared scoring index
+        embeddings, plan = Index.plan(path, vectors, maxsize, toprank, shards, workers, chunksize)
+
+        # Encode incomplete shards in separate processes
+        pending = [shard for shard in range(shards) if not plan.complete(shard)]
+        if pending:
+            with ProcessPoolExecutor(len(pending)) as executor:
+                futures = [executor.submit(Index.shard, path, vectors, maxsize, toprank, shards, shard, workers, chunksize) for shard in pending]
+                for future in futures:
+                    future.result()
+
+        # Merge shard vectors and build embeddings index using the merged vectors as a checkpoint
+        checkpoint, ids = plan.merge(embeddings.model, embeddings.model.vectorsid(), embeddings.config.get("batch", 1024))
+        embeddings.index(((uid, [], None) for uid in ids), checkpoint=checkpoint)
+
+        return embeddings
+
+    @staticmethod
+    def shard(path, vectors, maxsize, toprank, shards, shard, workers=0, chunksize=1000):
+        """
+        Encodes vectors for a single shard.
+
+        Args:
+            path: model path
+            vectors: path to vectors file or configuration
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+            shards: number of shards
+            shard: shard index
+            workers: number of worker processes used to filter and tokenize rows
+            chunksize: number of rows per worker chunk
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        # Load shard plan and shared scoring index
+        embeddings, plan = Index.plan(path, vectors, maxsize, toprank, shards, workers, chunksize)
+
+        # Stream sections of shard articles
+        articles = plan.articles(dbfile, Index.articles(maxsize, toprank), shard)
+        documents = Index.stream(dbfile, maxsize, toprank, embeddings.isweighted(), workers, chunksize, articles)
+
+        # Encode vectors and mark shard complete
+        print(f"Building shard {shard} with {len(articles)} articles")
+        ids, _, _, _ = embeddings.model.index(documents, embeddings.config.get("batch", 1024), plan.directory(shard))
+        plan.save(shard, ids)
+
+    @staticmethod
+    def plan(path, vectors, maxsize, toprank, shards, workers, chunksize):
+        """
+        Loads or creates a shard plan. Term weighting statistics are calculated once over all eligible articles and
+        shared by all shards.
+
+        Args:
+            path: model path
+            vectors: path to vectors file or configuration
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+            shards: number of shards
+            workers: number of worker processes used to filter and tokenize rows
+            chunksize: number of rows per worker chunk
+
+        Returns:
+            (embeddings, Shards)
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        # Read config and create Embeddings instance
+        embeddings = Embeddings(Index.config(vectors))
+
+        # Load or create shard plan
+        plan = Shards(os.path.join(path, "shards"), shards, Index.parameters(dbfile, vectors, maxsize, toprank))
+        plan.plan(dbfile, Index.articles(maxsize, toprank))
+
+        # Load or build scoring index
+        if embeddings.isweighted():
+            scoring = plan.file("scoring")
+            if not os.path.exists(scoring):
+                embeddings.score(Index.stream(dbfile, maxsize, toprank, True, workers, chunksize))
+                embeddings.scoring.save(f"{scoring}.tmp")
+                os.replace(f"{scoring}.tmp", scoring)
+            else:
+                embeddings.scoring.load(scoring)
+
+        return embeddings, plan
+
+    @staticmethod
+    def parameters(dbfile, vectors, maxsize, toprank):
+        """
+        Gets the index parameters checkpoints and shard plans are created with. Resuming depends on the section query
+        returning the same rows in the same order. This includes the section filter mode and a fingerprint of dbfile, which
+        change when sections are prepared or added.
+
+        Args:
+            dbfile: input SQLite file
+            vectors: path to vectors file or configuration
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+
+        Returns:
+            index parameters
+        """
+
+        db = sqlite3.connect(dbfile)
+        prepared = Prepare.exists(db)
+        db.close()
+
+        return (vectors, maxsize, toprank, prepared, Vectors.fingerprint(dbfile))
+
+    # pylint: disable=R0913
+    @staticmethod
+    def run(path, vectors, maxsize=0, toprank=0, workers=0, chunksize=1000, spill=False, checkpoint=0, resume=False, shards=0, fts=False):
         """
         Executes an index run.
 
@@ -141,19 +525,216 @@ class Index:
             vectors: path to vectors file or configuration, if None uses default path
             maxsize: maximum number of documents to process
             toprank: only index the topn ranked articles by citation count within the dataset
+            workers: number of worker processes used to filter and tokenize rows
+            chunksize: number of rows per worker chunk
+            spill: if True, scoring indexes tokenize documents once into a spill cache that is replayed to build the index
+            checkpoint: number of section query rows between checkpoints, checkpointing is disabled if 0
+            resume: resumes from the last checkpoint if True
+            shards: number of shards, builds shards in separate processes and merges them when set, spill and checkpoint are
+                    ignored when set
+            fts: builds a full text index if True, an existing full text index is always rebuilt
         """
 
         dbfile = os.path.join(path, "articles.sqlite")
 
+        # Create checkpoint, if necessary
+        if checkpoint or resume:
+            checkpoint = Checkpoint(os.path.join(path, "checkpoint"), checkpoint, resume, Index.parameters(dbfile, vectors, maxsize, toprank))
+        else:
+            checkpoint = None
+
+        # Create a new manifest of indexed articles, replaces the existing manifest when saved
+        manifest = Manifest(path)
+        manifest.changes(dbfile, Index.articles(maxsize, toprank), {"maxsize": maxsize, "toprank": toprank}, rebuild=True)
+
         print("Building new model")
-        embeddings = Index.embeddings(dbfile, vectors, maxsize, toprank)
+        if shards:
+            embeddings = Index.sharded(path, vectors, maxsize, toprank, shards, workers, chunksize)
+        else:
+            embeddings = Index.embeddings(dbfile, vectors, maxsize, toprank, workers, chunksize, spill, checkpoint)
+
         embeddings.save(path)
 
+        # Save manifest after the model is saved
+        manifest.save()
+
+        # Build full text index, if necessary
+        if fts or FTS.exists(path):
+            Index.fulltext(path, maxsize, toprank, embeddings.isweighted())
+
+        # Remove checkpoint and shards after the model is saved
+        if checkpoint:
+            checkpoint.clear()
+
+        if shards:
+            Shards(os.path.join(path, "shards"), shards, None).clear()
+
+    @staticmethod
+    def update(path, workers=0, chunksize=1000):
+        """
+        Executes an incremental index run. Compares the articles in articles.sqlite with the manifest saved with the
+        embeddings index. Sections of new and changed articles are upserted, sections of removed articles are deleted.
+        The updated index is saved in place.
+
+        Term weighting statistics of scoring indexes are not recalculated, a full index run is required for that.
+
+        Args:
+            path: model path
+            workers: number of worker processes used to filter and tokenize rows
+            chunksize: number of rows per worker chunk
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        # Read manifest, requires a full index run to create
+        manifest = Manifest(path)
+        if not manifest.exists():
+            raise FileNotFoundError(f"Manifest not found in {path}, run a full index build first")
+
+        # Use the same article filters as the full index run
+        metadata = manifest.metadata()
+        if "maxsize" not in metadata or "toprank" not in metadata:
+            raise ValueError(f"Manifest in {path} is incomplete, run a full index build first")
+
+        maxsize, toprank = int(metadata["maxsize"]), int(metadata["toprank"])
+
+        # Find new and changed articles along with sections to delete
+        articles, deletes = manifest.changes(dbfile, Index.articles(maxsize, toprank))
+        print(f"Updating model, {len(articles)} new or changed articles, {len(deletes)} sections to delete")
+
+        if articles or deletes:
+            embeddings = IndexEmbeddings()
+            embeddings.load(path)
+
+            # Delete sections of changed and removed articles
+            if deletes:
+                embeddings.delete(deletes)
+
+            # Upsert sections of new and changed articles
+            if articles:
+                embeddings.upsert(Index.stream(dbfile, maxsize, toprank, embeddings.isweighted(), workers, chunksize, articles))
+
+            embeddings.save(path)
+
+            # Update full text index, if available
+            if FTS.exists(path):
+                Index.fulltext(path, maxsize, toprank, embeddings.isweighted(), articles, deletes)
+
+        # Save manifest after the model is saved
+        manifest.save()
+
+    @staticmethod
+    def delete(embeddings, ids):
+        """
+        Deletes ids from an embeddings index. Embeddings.delete scans all index ids once per deleted id when content
+        storage is disabled, which is the case for paperai indexes. This method finds all deleted ids in a single pass.
+
+        Args:
+            embeddings: embeddings index
+            ids: list of ids to delete
+
+        Returns:
+            list of ids deleted
+        """
+
+        # Content storage looks up ids in the database
+        if embeddings.database:
+            return embeddings.delete(ids)
+
+        # Find internal indices of deleted ids
+        ids = set(ids)
+        indices = [index for index, uid in enumerate(embeddings.ids) if uid is not None and uid in ids]
+
+        # Clear embeddings ids
+        deletes = []
+        for index in indices:
+            deletes.append(embeddings.ids[index])
+            embeddings.ids[index] = None
+
+        # Delete indices for all indexes, same as Embeddings.delete
+        if indices:
+            if embeddings.isdense():
+                embeddings.ann.delete(indices)
+
+            if embeddings.issparse():
+                embeddings.scoring.delete(indices)
+
+            if embeddings.indexes:
+                embeddings.indexes.delete(indices)
+
+            if embeddings.graph:
+                embeddings.graph.delete(indices)
+
+        return deletes
+
+    @staticmethod
+    def fulltext(path, maxsize, toprank, scoring, articles=None, deletes=None):
+        """
+        Builds a full text index over the sections selected for indexing. When articles is set, the existing full text
+        index is updated instead. Sections in deletes are deleted and sections of articles are upserted.
+
+        Args:
+            path: model path
+            maxsize: maximum number of documents to process
+            toprank: only index the topn ranked articles by citation count within the dataset
+            scoring: True if index uses a scoring model, False otherwise
+            articles: optional list of new and changed article ids, updates the full text index when set
+            deletes: optional list of section ids to delete
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        # Connection to database file
+        db = sqlite3.connect(dbfile)
+        cur = db.cursor()
+
+        # Run section query
+        query, filtered = Index.query(cur, maxsize, toprank, scoring, articles)
+        cur.execute(query)
+
+        # Full text index the same sections as the embeddings index
+        rows = ((uid, text) for uid, name, text, _ in cur if not scoring or filtered or Prepare.eligible(name))
+        if articles is None:
+            FTS.build(path, rows)
+        else:
+            FTS.update(path, deletes if deletes else [], rows)
+
+        # Free database resources
+        db.close()
+
 
 if __name__ == "__main__":
-    Index.run(
-        sys.argv[1] if len(sys.argv) > 1 else None,
-        sys.argv[2] if len(sys.argv) > 2 else None,
-        int(sys.argv[3]) if len(sys.argv) > 3 else 0,
-        int(sys.argv[4]) if len(sys.argv) > 4 else 0,
-    )
+    parser = argparse.ArgumentParser(description="Builds a paperai embeddings index")
+    parser.add_argument("path", nargs="?", help="model path")
+    parser.add_argument("vectors", nargs="?", help="vectors model path or index configuration")
+    parser.add_argument("maxsize", nargs="?", type=int, default=0, help="maximum number of documents to process")
+    parser.add_argument("toprank", nargs="?", type=int, default=0, help="only index the topn ranked articles by citation count")
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes used to filter and tokenize rows")
+    parser.add_argument("--chunksize", type=int, default=1000, help="number of rows per worker chunk")
+    parser.add_argument("--spill", action="store_true", help="tokenize once into a spill cache for scoring indexes")
+    parser.add_argument("--update", action="store_true", help="incrementally update an existing index using its manifest")
+    parser.add_argument("--checkpoint", type=int, default=0, help="number of section rows between checkpoints")
+    parser.add_argument("--resume", action="store_true", help="resume an interrupted index build from the last checkpoint")
+    parser.add_argument("--shards", type=int, default=0, help="number of shards built in separate processes and merged")
+    parser.add_argument("--shard", type=int, help="only build this shard, requires --shards")
+    parser.add_argument("--fts", action="store_true", help="build a full text index for +required and -prohibited query terms")
+    args = parser.parse_args()
+
+    if args.update:
+        Index.update(args.path, args.workers, args.chunksize)
+    elif args.shard is not None:
+        Index.shard(args.path, args.vectors, args.maxsize, args.toprank, args.shards, args.shard, args.workers, args.chunksize)
+    else:
+        Index.run(
+            args.path,
+            args.vectors,
+            args.maxsize,
+            args.toprank,
+            args.workers,
+            args.chunksize,
+            args.spill,
+            args.checkpoint,
+            args.resume,
+            args.shards,
+            args.fts,
+        )
@@ -0,0 +1,163 @@
+"""
+Manifest module
+"""
+
+import os
+import sqlite3
+
+from datetime import datetime, timezone
+
+
+class Manifest:
+    """
+    Tracks the articles and sections stored in an embeddings index along with the last indexed high-water mark.
+    A manifest is stored alongside the embeddings index and enables incremental index updates.
+
+    A new manifest for a full index run is staged in a temporary file, which replaces the existing manifest when saved.
+    This keeps the existing manifest in place when a full index run fails.
+    """
+
+    def __init__(self, path):
+        """
+        Creates a new manifest.
+
+        Args:
+            path: model path
+        """
+
+        self.path = os.path.join(path, "manifest.sqlite")
+
+        # Manifest file changes are written to, a temporary file when creating a new manifest
+        self.output = None
+
+        # Connection to articles database with manifest attached
+        self.db = None
+
+    def exists(self):
+        """
+        Checks if a manifest exists for this model path.
+
+        Returns:
+            True if a manifest exists, False otherwise
+        """
+
+        return os.path.exists(self.path)
+
+    def metadata(self):
+        """
+        Reads manifest metadata.
+
+        Returns:
+            {key: value}, empty if the manifest has no metadata
+        """
+
+        db = sqlite3.connect(self.path)
+        metadata = {}
+        if db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'metadata'").fetchone():
+            metadata = dict(db.execute("SELECT Key, Value FROM metadata").fetchall())
+
+        db.close()
+
+        return metadata
+
+    def changes(self, dbfile, query, metadata=None, rebuild=False):
+        """
+        Compares the articles eligible for indexing with the articles in this manifest. An article is new or changed
+        when it's not in the manifest or the entry date differs. Sections are deleted when their article is changed or
+        no longer eligible.
+
+        Changes are staged and only written to the manifest when save is called.
+
+        Args:
+            dbfile: articles.sqlite file
+            query: query that selects the ids of articles eligible for indexing
+            metadata: optional metadata to store with the manifest
+            rebuild: compares against a new empty manifest if True, the existing manifest is replaced when saved
+
+        Returns:
+            (list of new or changed article ids, list of section ids to delete)
+        """
+
+        # Stage a new manifest in a temporary file, if necessary
+        self.output = f"{self.path}.tmp" if rebuild else self.path
+        if rebuild and os.path.exists(self.output):
+            os.remove(self.output)
+
+        self.db = sqlite3.connect(dbfile)
+        self.db.execute("ATTACH DATABASE ? AS manifest", [self.output])
+
+        # Create manifest tables, if necessary
+        self.db.execute("CREATE TABLE IF NOT EXISTS manifest.metadata (Key TEXT PRIMARY KEY, Value TEXT)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS manifest.articles (Id TEXT PRIMARY KEY, Entry DATETIME)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS manifest.sections (Id INTEGER PRIMARY KEY, Article TEXT)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS manifest.section_article ON sections(Article)")
+
+        # Current set of eligible articles with sections
+        self.db.execute(
+            f"CREATE TEMP TABLE eligible AS SELECT Id, Entry FROM main.articles WHERE id IN ({query}) AND id IN (SELECT article FROM main.sections)"
+        )
+        self.db.execute("CREATE UNIQUE INDEX temp.eligible_id ON eligible(Id)")
+
+        # New or changed articles
+        self.db.execute(
+            "CREATE TEMP TABLE changed AS SELECT c.Id FROM temp.eligible c LEFT JOIN manifest.articles m ON c.id = m.id "
+            + "WHERE m.id IS NULL OR c.entry IS NOT m.entry"
+        )
+        self.db.execute("CREATE UNIQUE INDEX temp.changed_id ON changed(Id)")
+
+        # Articles in manifest that are changed or no longer eligible
+        self.db.execute(
+            "CREATE TEMP TABLE stale AS SELECT Id FROM manifest.articles "
+            + "WHERE id NOT IN (SELECT id FROM temp.eligible) OR id IN (SELECT id FROM temp.changed)"
+        )
+
+        # Stage metadata
+        self.db.execute("CREATE TEMP TABLE metadata (Key TEXT PRIMARY KEY, Value TEXT)")
+        if metadata:
+            self.db.executemany("INSERT INTO temp.metadata VALUES (?, ?)", [(key, str(value)) for key, value in metadata.items()])
+
+        articles = [row[0] for row in self.db.execute("SELECT id FROM temp.changed")]
+        deletes = [row[0] for row in self.db.execute("SELECT id FROM manifest.sections WHERE article IN (SELECT id FROM temp.stale)")]
+
+        return articles, deletes
+
+    def save(self):
+        """
+        Writes staged changes to the manifest and closes the database connection.
+        """
+
+        # Remove stale articles
+        self.db.execute("DELETE FROM manifest.sections WHERE article IN (SELECT id FROM temp.stale)")
+        self.db.execute("DELETE FROM manifest.articles WHERE id IN (SELECT id FROM temp.stale)")
+
+        # Add new and changed articles
+        self.db.execute("INSERT INTO manifest.articles SELECT id, entry FROM temp.eligible WHERE id IN (SELECT id FROM temp.changed)")
+        self.db.execute("INSERT INTO manifest.sections SELECT id, article FROM main.sections WHERE article IN (SELECT id FROM temp.changed)")
+
+        # Update high-water mark and statistics
+        self.db.execute("INSERT OR REPLACE INTO manifest.metadata SELECT Key, Value FROM temp.metadata")
+        self.db.executemany(
+            "INSERT OR REPLACE INTO manifest.metadata VALUES (?, ?)",
+            [
+                ("entry", self.db.execute("SELECT max(entry) FROM manifest.articles").fetchone()[0]),
+                ("articles", self.db.execute("SELECT count(*) FROM manifest.articles").fetchone()[0]),
+                ("sections", self.db.execute("SELECT count(*) FROM manifest.sections").fetchone()[0]),
+                ("updated", datetime.now(timezone.utc).isoformat()),
+            ],
+        )
+
+        self.db.commit()
+        self.close()
+
+        # Replace existing manifest with new manifest
+        if self.output != self.path:
+            os.replace(self.output, self.path)
+
+    def close(self):
+        """
+        Closes the database connection.
+        """
+
+        if self.db:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,144 @@
+"""
+MinHash module
+"""
+
+import zlib
+
+import numpy as np
+
+
+class MinHash:
+    """
+    MinHash signatures with locality sensitive hashing (LSH) buckets. Signatures estimate the Jaccard index between token
+    sets. Signatures are split into bands and sets that share a band are candidate near-duplicates, which finds similar
+    sets without comparing each pair of sets.
+    """
+
+    # Number of hash functions per signature
+    PERMUTATIONS = 128
+
+    # Hash function parameters, generated with a fixed seed so signatures are stable across processes and can be stored
+    A, B = np.random.default_rng(6067).integers(1, 2**63, (2, PERMUTATIONS), dtype=np.uint64)
+    A |= np.uint64(1)
+
+    def __init__(self, bands=32):
+        """
+        Creates a new LSH index. The probability two sets with Jaccard index j share a band is 1 - (1 - j^r)^bands,
+        where r = PERMUTATIONS / bands. More bands find less similar candidates.
+
+        Args:
+            bands: number of signature bands
+        """
+
+        self.bands = bands
+        self.rows = MinHash.PERMUTATIONS // bands
+
+        # Ids by band value, one bucket dict per band
+        self.buckets = [{} for _ in range(bands)]
+
+    @staticmethod
+    def signature(tokens):
+        """
+        Builds a MinHash signature for a set of tokens. Each hash function is a multiply-shift hash of the CRC32 hash of
+        a token.
+
+        Args:
+            tokens: iterable of tokens
+
+        Returns:
+            signature as a uint32 array, None if there are no tokens
+        """
+
+        values = np.array([zlib.crc32(token.encode("utf-8")) for token in set(tokens)], dtype=np.uint64)
+        if not values.size:
+            return None
+
+        # Minimum of each hash function over all tokens, unsigned integer math wraps mod 2^64
+        return ((np.outer(values, MinHash.A) + MinHash.B) >> np.uint64(32)).min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def similarity(signature1, signature2):
+        """
+        Estimates the Jaccard index of two token sets from their signatures.
+
+        Args:
+            signature1: signature 1
+            signature2: signature 2
+
+        Returns:
+            estimated Jaccard index
+        """
+
+        return float(np.mean(signature1 == signature2))
+
+    @staticmethod
+    def serialize(signature):
+        """
+        Serializes a signature for storage.
+
+        Args:
+            signature: signature, can be None
+
+        Returns:
+            signature bytes, None if signature is None
+        """
+
+        return signature.tobytes() if signature is not None else None
+
+    @staticmethod
+    def deserialize(data):
+        """
+        Deserializes stored signature bytes.
+
+        Args:
+            data: signature bytes, can be None
+
+        Returns:
+            signature, None if data is None
+        """
+
+        return np.frombuffer(data, dtype=np.uint32) if data is not None else None
+
+    def insert(self, uid, signature):
+        """
+        Adds a signature to the LSH buckets. Signatures for empty token sets are skipped.
+
+        Args:
+            uid: id
+            signature: signature
+        """
+
+        if signature is not None:
+            for bucket, key in zip(self.buckets, self.keys(signature)):
+                bucket.setdefault(key, []).append(uid)
+
+    def query(self, signature):
+        """
+        Finds candidate near-duplicates of a signature. Candidates share at least one band with the signature.
+
+        Args:
+            signature: signature
+
+        Returns:
+            set of candidate ids
+        """
+
+        candidates = set()
+        if signature is not None:
+            for bucket, key in zip(self.buckets, self.keys(signature)):
+                candidates.update(bucket.get(key, ()))
+
+        return candidates
+
+    def keys(self, signature):
+        """
+        Splits a signature into band keys.
+
+        Args:
+            signature: signature
+
+        Returns:
+            list of band keys
+        """
+
+        return [band.tobytes() for band in signature[: self.bands * self.rows].reshape(self.bands, self.rows)]
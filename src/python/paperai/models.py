@@ -6,14 +6,25 @@ import os
 import os.path
 import sqlite3
 
+from urllib.request import pathname2url
+
 from txtai.embeddings import Embeddings
 
+from .fts import FTS
+from .prepare import Prepare
+
 
 class Models:
     """
     Common methods for generating data paths.
     """
 
+    # Memory map size for read-only connections, in bytes
+    MMAP_SIZE = 256 * 1024 * 1024
+
+    # Page cache size for read-only connections, negative values are in KiB
+    CACHE_SIZE = -64 * 1024
+
     @staticmethod
     def load(path):
         """
@@ -35,10 +46,39 @@ class Models:
             embeddings.load(path)
 
         # Connect to database file
-        db = sqlite3.connect(dbfile)
+        db = Models.connect(dbfile)
+
+        # Attach token cache and full text index, if available
+        Prepare.attach(db, dbfile)
+        FTS.attach(db, dbfile)
 
         return (embeddings, db)
 
+    @staticmethod
+    def connect(dbfile, shared=False):
+        """
+        Opens a read-only connection to a SQLite database file. The connection is tuned for query workloads, the database
+        file is memory mapped and a larger page cache is used.
+
+        Args:
+            dbfile: SQLite file
+            shared: allows the connection to be used by threads other than the creating thread, if True
+
+        Returns:
+            db handle
+        """
+
+        # Open database file in read-only mode
+        db = sqlite3.connect(f"file:{pathname2url(os.path.abspath(dbfile))}?mode=ro", uri=True, check_same_thread=not shared)
+
+        # Tune connection for reads
+        db.execute(f"PRAGMA mmap_size = {Models.MMAP_SIZE}")
+        db.execute(f"PRAGMA cache_size = {Models.CACHE_SIZE}")
+        db.execute("PRAGMA temp_store = MEMORY")
+        db.execute("PRAGMA query_only = 1")
+
+        return db
+
     @staticmethod
     def close(db):
         """
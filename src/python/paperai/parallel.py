@@ -0,0 +1,58 @@
+"""
+Parallel module
+"""
+
+from collections import deque
+from multiprocessing import Pool
+
+
+class Parallel:
+    """
+    Methods to process a stream of row chunks with a pool of worker processes.
+    """
+
+    @staticmethod
+    def chunks(cur, size):
+        """
+        Reads rows from a database cursor in chunks. This method is a generator and will yield a chunk at a time.
+
+        Args:
+            cur: database cursor with an executed query
+            size: number of rows per chunk
+        """
+
+        yield from iter(lambda: cur.fetchmany(size), [])
+
+    @staticmethod
+    def map(function, chunks, workers, args=()):
+        """
+        Runs function over each chunk. When workers is set, chunks are processed by a pool of worker processes.
+        Results are always yielded in input order. The number of chunks in flight is bounded to limit memory usage
+        and chunks are read in the calling thread, which allows reading directly from a database cursor.
+
+        Args:
+            function: function to run, must be picklable when workers is set
+            chunks: iterable of chunks
+            workers: number of worker processes, processes chunks in the current process if 0 or None
+            args: additional arguments passed to function
+
+        Returns:
+            generator of function results
+        """
+
+        if not workers:
+            for chunk in chunks:
+                yield function(chunk, *args)
+        else:
+            with Pool(workers) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.apply_async(function, (chunk, *args)))
+
+                    # Wait for oldest chunk when queue is full
+                    if len(pending) >= workers * 2:
+                        yield pending.popleft().get()
+
+                # Drain remaining chunks
+                while pending:
+                    yield pending.popleft().get()
@@ -0,0 +1,126 @@
+"""
+Pool module
+"""
+
+from contextlib import contextmanager
+from queue import LifoQueue
+from threading import Lock
+
+from .fts import FTS
+from .models import Models
+from .prepare import Prepare
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of read-only database connections. Connections are opened on demand up to the pool size and reused
+    across requests, which keeps page caches warm.
+    """
+
+    def __init__(self, dbfile, size=8):
+        """
+        Creates a new connection pool.
+
+        Args:
+            dbfile: SQLite file
+            size: maximum number of open connections
+        """
+
+        self.dbfile = dbfile
+        self.size = size
+
+        # Idle connections, most recently used connections are checked out first
+        self.idle = LifoQueue()
+
+        # Number of open connections
+        self.opened = 0
+        self.lock = Lock()
+        self.closed = False
+
+    @contextmanager
+    def connection(self):
+        """
+        Checks out a connection for the duration of a with block and returns it to the pool afterwards.
+
+        Returns:
+            database connection
+        """
+
+        db = self.checkout()
+        try:
+            yield db
+        finally:
+            self.checkin(db)
+
+    def checkout(self):
+        """
+        Checks out a connection. Opens a new connection when no idle connections are available and the pool isn't full,
+        otherwise waits for a connection to be returned.
+
+        Returns:
+            database connection
+        """
+
+        with self.lock:
+            if self.closed:
+                raise ValueError("Connection pool is closed")
+
+            create = self.idle.empty() and self.opened < self.size
+            if create:
+                self.opened += 1
+
+        if create:
+            try:
+                return self.connect()
+            except Exception:
+                with self.lock:
+                    self.opened -= 1
+                raise
+
+        return self.idle.get()
+
+    def checkin(self, db):
+        """
+        Returns a connection to the pool. Connections returned after the pool is closed are closed.
+
+        Args:
+            db: database connection
+        """
+
+        with self.lock:
+            if not self.closed:
+                self.idle.put(db)
+                return
+
+            self.opened -= 1
+
+        db.close()
+
+    def connect(self):
+        """
+        Opens a new pooled connection.
+
+        Returns:
+            database connection
+        """
+
+        # Connections are used by one thread at a time but can move between request threads
+        db = Models.connect(self.dbfile, shared=True)
+
+        # Attach token cache and full text index, if available
+        Prepare.attach(db, self.dbfile)
+        FTS.attach(db, self.dbfile)
+
+        return db
+
+    def close(self):
+        """
+        Closes all idle connections. Connections currently checked out are closed when returned.
+        """
+
+        with self.lock:
+            self.closed = True
+
+            while not self.idle.empty():
+                self.idle.get().close()
+                self.opened -= 1
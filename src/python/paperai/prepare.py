@@ -0,0 +1,277 @@
+"""
+Prepare module
+"""
+
+import argparse
+import os.path
+import sqlite3
+
+import regex as re
+
+from txtai.pipeline import Tokenizer
+
+from .highlights import Highlights
+from .minhash import MinHash
+from .parallel import Parallel
+
+
+class Prepare:
+    """
+    Stores a section eligibility flag and token count for each section in articles.sqlite. This allows section filtering
+    to run in SQL instead of reading and filtering each section in Python.
+
+    Section tokens can optionally be stored in a token cache. The token cache is a tokens.sqlite file alongside
+    articles.sqlite, keyed by section id. The token cache can also store MinHash signatures of section highlight tokens,
+    which are used to find near-duplicate sections.
+    """
+
+    # Section filter, sections with names matching this filter are not eligible for indexing
+    SECTION_FILTER = r"background|(?<!.*?results.*?)discussion|introduction|reference"
+
+    # Token cache file name
+    TOKENS = "tokens.sqlite"
+
+    @staticmethod
+    def exists(cur):
+        """
+        Checks if section eligibility columns exist and are set for all sections.
+
+        Args:
+            cur: database cursor or connection
+
+        Returns:
+            True if all sections are prepared, False otherwise
+        """
+
+        columns = [row[1].lower() for row in cur.execute("PRAGMA table_info(sections)")]
+        if "eligible" not in columns or "tokens" not in columns:
+            return False
+
+        # Sections added after the last prepare run have a NULL eligibility flag
+        return not cur.execute("SELECT 1 FROM sections WHERE Eligible IS NULL LIMIT 1").fetchone()
+
+    @staticmethod
+    def attach(cur, dbfile):
+        """
+        Attaches the token cache for dbfile as the tokens schema. The token cache is only used when it exists and all
+        sections are prepared, which ensures it has tokens for the current sections.
+
+        Args:
+            cur: database cursor or connection
+            dbfile: articles.sqlite file
+
+        Returns:
+            True if the token cache is attached, False otherwise
+        """
+
+        if Prepare.attached(cur):
+            return True
+
+        path = os.path.join(os.path.dirname(dbfile), Prepare.TOKENS)
+        if os.path.exists(path) and Prepare.exists(cur):
+            cur.execute("ATTACH DATABASE ? AS tokens", [path])
+            return True
+
+        return False
+
+    @staticmethod
+    def attached(cur):
+        """
+        Checks if the token cache is attached.
+
+        Args:
+            cur: database cursor or connection
+
+        Returns:
+            True if the token cache is attached, False otherwise
+        """
+
+        return any(row[1] == "tokens" for row in cur.execute("PRAGMA database_list"))
+
+    @staticmethod
+    def lookup(cur, ids):
+        """
+        Looks up cached tokens for a list of section ids.
+
+        Args:
+            cur: database cursor or connection
+            ids: list of section ids
+
+        Returns:
+            {section id: tokens}, empty if the token cache is not attached
+        """
+
+        if not ids or not Prepare.attached(cur):
+            return {}
+
+        rows = cur.execute(f"SELECT Id, Terms FROM tokens.tokens WHERE Id IN ({', '.join(['?'] * len(ids))})", list(ids))
+        return {uid: terms.split() for uid, terms in rows if terms is not None}
+
+    @staticmethod
+    def signatures(cur, ids):
+        """
+        Looks up cached MinHash signatures for a list of section ids.
+
+        Args:
+            cur: database cursor or connection
+            ids: list of section ids
+
+        Returns:
+            {section id: signature}, empty if the token cache is not attached or doesn't have signatures
+        """
+
+        if not ids or not Prepare.attached(cur) or not Prepare.signed(cur):
+            return {}
+
+        rows = cur.execute(f"SELECT Id, Signature FROM tokens.signatures WHERE Id IN ({', '.join(['?'] * len(ids))})", list(ids))
+        return {uid: MinHash.deserialize(signature) for uid, signature in rows if signature is not None}
+
+    @staticmethod
+    def signed(cur, schema="tokens"):
+        """
+        Checks if the token cache has a signatures table.
+
+        Args:
+            cur: database cursor or connection
+            schema: token cache schema name
+
+        Returns:
+            True if the token cache has signatures, False otherwise
+        """
+
+        return cur.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type = 'table' AND name = 'signatures'").fetchone() is not None
+
+    @staticmethod
+    def tokenize(text, terms=None):
+        """
+        Tokenizes text, uses cached tokens when available.
+
+        Args:
+            text: input text
+            terms: cached tokens as a space separated string, None if not cached
+
+        Returns:
+            list of tokens
+        """
+
+        return terms.split() if terms is not None else Tokenizer.tokenize(text)
+
+    @staticmethod
+    def eligible(name):
+        """
+        Checks if a section name is eligible for indexing.
+
+        Args:
+            name: section name
+
+        Returns:
+            True if section is eligible, False otherwise
+        """
+
+        return not name or not re.search(Prepare.SECTION_FILTER, name.lower())
+
+    @staticmethod
+    def sections(rows, tokens=False, signatures=False):
+        """
+        Calculates the eligibility flag, token count, tokens and signature for a chunk of section rows.
+
+        Args:
+            rows: list of (id, name, text) rows
+            tokens: returns space separated tokens if True, otherwise None
+            signatures: returns MinHash signature bytes of highlight tokens if True, otherwise None
+
+        Returns:
+            list of (id, eligible, token count, space separated tokens, signature bytes)
+        """
+
+        sections = []
+        for uid, name, text in rows:
+            terms = Tokenizer.tokenize(text)
+            signature = MinHash.serialize(MinHash.signature(Highlights.tokenize(text, terms))) if signatures else None
+            sections.append((uid, int(Prepare.eligible(name)), len(terms), " ".join(terms) if tokens else None, signature))
+
+        return sections
+
+    @staticmethod
+    def run(path, workers=0, chunksize=1000, tokens=False, signatures=False):
+        """
+        Adds section eligibility columns to articles.sqlite and calculates values for sections that don't have them set.
+        This method can be run again after new articles are loaded.
+
+        Args:
+            path: model path
+            workers: number of worker processes used to tokenize rows
+            chunksize: number of rows per worker chunk
+            tokens: creates a token cache if True, an existing token cache is always updated
+            signatures: stores MinHash signatures in the token cache if True, existing signatures are always updated
+        """
+
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        # Connection to database file
+        db = sqlite3.connect(dbfile)
+        cur = db.cursor()
+
+        # Attach token cache, if necessary
+        cache = os.path.join(path, Prepare.TOKENS)
+        tokens = tokens or signatures or os.path.exists(cache)
+        if tokens:
+            cur.execute("ATTACH DATABASE ? AS tokens", [cache])
+            cur.execute("CREATE TABLE IF NOT EXISTS tokens.tokens (Id INTEGER PRIMARY KEY, Terms TEXT)")
+
+            # Create signatures table, if necessary
+            signatures = signatures or Prepare.signed(cur)
+            if signatures:
+                cur.execute("CREATE TABLE IF NOT EXISTS tokens.signatures (Id INTEGER PRIMARY KEY, Signature BLOB)")
+
+        # Add columns, if necessary
+        columns = [row[1].lower() for row in cur.execute("PRAGMA table_info(sections)")]
+        for column in ["Eligible", "Tokens"]:
+            if column.lower() not in columns:
+                cur.execute(f"ALTER TABLE sections ADD COLUMN {column} INTEGER")
+
+        cur.execute("CREATE INDEX IF NOT EXISTS section_eligible ON sections(Eligible, Tokens)")
+
+        # Calculate values into a temporary table while reading sections
+        cur.execute("CREATE TEMP TABLE prepared (Id INTEGER PRIMARY KEY, Eligible INTEGER, Tokens INTEGER, Terms TEXT, Signature BLOB)")
+
+        # Select sections that aren't prepared or cached
+        query = "SELECT Id, Name, Text FROM sections WHERE Eligible IS NULL"
+        if tokens:
+            query += " OR Id NOT IN (SELECT Id FROM tokens.tokens)"
+        if signatures:
+            query += " OR Id NOT IN (SELECT Id FROM tokens.signatures)"
+
+        count = 0
+        rows = db.execute(query)
+        for sections in Parallel.map(Prepare.sections, Parallel.chunks(rows, chunksize), workers, (tokens, signatures)):
+            cur.executemany("INSERT INTO temp.prepared VALUES (?, ?, ?, ?, ?)", sections)
+
+            count += len(sections)
+            print(f"Prepared {count} sections", end="\r")
+
+        # Copy values to sections table and token cache
+        cur.execute("UPDATE sections SET Eligible = p.Eligible, Tokens = p.Tokens FROM temp.prepared p WHERE sections.id = p.id")
+        if tokens:
+            cur.execute("INSERT OR REPLACE INTO tokens.tokens SELECT Id, Terms FROM temp.prepared")
+        if signatures:
+            cur.execute("INSERT OR REPLACE INTO tokens.signatures SELECT Id, Signature FROM temp.prepared")
+
+        db.commit()
+
+        print(f"Prepared {count} total sections")
+
+        # Free database resources
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stores section eligibility flags, token counts and optionally tokens for articles.sqlite")
+    parser.add_argument("path", help="model path")
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes used to tokenize rows")
+    parser.add_argument("--chunksize", type=int, default=1000, help="number of rows per worker chunk")
+    parser.add_argument("--tokens", action="store_true", help="store section tokens in a token cache")
+    parser.add_argument("--signatures", action="store_true", help="store section MinHash signatures in the token cache")
+    args = parser.parse_args()
+
+    Prepare.run(args.path, args.workers, args.chunksize, args.tokens, args.signatures)
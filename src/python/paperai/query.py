@@ -2,16 +2,23 @@
 Query module
 """
 
+import heapq
 import re
 import sys
 
+from functools import lru_cache
+
 from dateutil import parser
 from rich.console import Console
 
 from txtai.pipeline import Tokenizer
 
+from .cache import ResultCache
+from .fts import FTS
 from .highlights import Highlights
+from .minhash import MinHash
 from .models import Models
+from .prepare import Prepare
 
 
 class Query:
@@ -19,8 +26,24 @@ class Query:
     Methods to query an embeddings index.
     """
 
+    # Maximum number of ids per IN query, kept below the SQLite bound variable limit
+    BATCH = 999
+
+    # Minimum Jaccard index between an article's best section and a section of a higher ranked article for the article
+    # to be considered a near-duplicate
+    DUPLICATE = 0.8
+
+    # Reference links ([1], [2], etc)
+    REFERENCES = re.compile(r"\s*[\[(][0-9, ]+[\])]\s*")
+
+    # Http links
+    LINKS = re.compile(r"http.+?\s")
+
+    # Maximum number of formatted match texts cached
+    TEXTCACHE = 4096
+
     @staticmethod
-    def search(embeddings, cur, query, topn, threshold):
+    def search(embeddings, cur, query, topn, threshold, adaptive=False, metrics=None, cache=None):
         """
         Executes an embeddings search for the input query. Each returned result is resolved
         to the full section row.
@@ -31,35 +54,138 @@ class Query:
             query: query text
             topn: number of documents to return
             threshold: require at least this score to include result
+            adaptive: widens the candidate window until topn documents match, if True
+            metrics: optional dict, stores the number of candidates fetched from the index
+            cache: optional ResultCache, returns cached results for repeated queries
 
         Returns:
             search results
         """
 
-        if query == "*":
-            return []
+        if cache:
+            key = ResultCache.key(query, topn, threshold, adaptive)
+            results = cache.get(key)
+            if results is not None:
+                if metrics is not None:
+                    metrics["candidates"] = [0]
+
+                return list(results)
+
+        results = Query.batchsearch(embeddings, cur, [query], topn, threshold, adaptive, metrics)[0]
+
+        if cache:
+            cache.put(key, tuple(results))
+
+        return results
+
+    @staticmethod
+    def batchsearch(embeddings, cur, queries, topn, threshold, adaptive=False, metrics=None):
+        """
+        Executes an embeddings search for a list of queries. All queries are encoded and searched in a single batch and
+        all results are resolved to full section rows together.
+
+        By default, topn * 5 candidates are retrieved for each query. In adaptive mode, the search starts with topn
+        candidates. The candidate window doubles for queries that still have less than topn matching documents until
+        the scores drop below the threshold or the index has no more results.
+
+        When a full text index is attached, candidates are filtered with the full text index before they are resolved. For
+        term weighting indexes, sections matching the required terms of a query are instead ranked directly if there are at
+        most FTS.LIMIT matches. Ranking encodes the text of each matching section, which is only fast enough for word
+        vectors models.
+
+        Args:
+            embeddings: embeddings model
+            cur: database cursor
+            queries: list of query text
+            topn: number of documents to return per query
+            threshold: require at least this score to include result
+            adaptive: widens the candidate window until topn documents match, if True
+            metrics: optional dict, the candidates key is set to the number of candidates fetched for each query
+
+        Returns:
+            list of search results, one per query
+        """
 
         # Default threshold if None
         threshold = threshold if threshold is not None else 0.25
 
-        results = []
+        results = [[] for _ in queries]
+        fetched = [0 for _ in queries]
 
-        # Get list of required and prohibited tokens
-        must = [token.strip("+") for token in query.split() if token.startswith("+") and len(token) > 1]
-        mnot = [token.strip("-") for token in query.split() if token.startswith("-") and len(token) > 1]
+        # Wildcard queries have no search results
+        pending = [x for x, query in enumerate(queries) if query != "*"]
+
+        # Tokenize search queries, if necessary
+        weighted = embeddings.isweighted()
+        tokens = {x: Tokenizer.tokenize(queries[x]) if weighted else queries[x] for x in pending}
+
+        # Retrieve topn * 5 to account for duplicate matches, adaptive mode starts with topn
+        window = topn if adaptive else topn * 5
+
+        # Resolved section rows, shared across queries and windows
+        sections = {}
+
+        # Rank sections that contain the required terms directly, if possible
+        for x in list(pending) if weighted and FTS.attached(cur) else []:
+            ids = FTS.match(cur, *Query.terms(queries[x]))
+            if ids is not None:
+                sections.update(Query.sections(cur, [uid for uid in ids if uid not in sections]))
+
+                candidates = [(uid, score) for uid, score in Query.rank(embeddings, cur, tokens[x], ids, sections) if score >= threshold]
+                results[x] = Query.filter(queries[x], candidates[: topn * 5], sections)
+                fetched[x] = len(ids)
+
+                pending.remove(x)
 
-        # Tokenize search query, if necessary
-        query = Tokenizer.tokenize(query) if embeddings.isweighted() else query
+        while pending:
+            candidates, complete = {}, []
+            for x, matches in zip(pending, embeddings.batchsearch([tokens[x] for x in pending], window)):
+                matches = [(result["id"], result["score"]) if isinstance(result, dict) else result for result in matches]
+                candidates[x] = Query.intersect(cur, queries[x], [(uid, score) for uid, score in matches if score >= threshold])
+                fetched[x] = len(matches)
 
-        # Retrieve topn * 5 to account for duplicate matches
-        for result in embeddings.search(query, topn * 5):
-            uid, score = (result["id"], result["score"]) if isinstance(result, dict) else result
+                # Wider windows can't add results when the index is exhausted or scores are below the threshold
+                if len(matches) < window or matches[-1][1] < threshold:
+                    complete.append(x)
 
-            if score >= threshold:
-                cur.execute("SELECT Article, Text FROM sections WHERE id = ?", [uid])
+            # Resolve matching rows not resolved in a prior window
+            ids = [uid for matches in candidates.values() for uid, _ in matches if uid not in sections]
+            sections.update(Query.sections(cur, list(dict.fromkeys(ids))))
 
-                # Get matching row
-                sid, text = cur.fetchone()
+            for x, matches in candidates.items():
+                results[x] = Query.filter(queries[x], matches, sections)
+
+            # Widen window for queries with less than topn matching documents
+            pending = [x for x in pending if adaptive and x not in complete and len({row[2] for row in results[x]}) < topn]
+            window *= 2
+
+        if metrics is not None:
+            metrics["candidates"] = fetched
+
+        return results
+
+    @staticmethod
+    def filter(query, candidates, sections):
+        """
+        Filters search candidates by the required (+term) and prohibited (-term) tokens in query.
+
+        Args:
+            query: query text
+            candidates: list of (section id, score)
+            sections: {section id: (article id, text)}
+
+        Returns:
+            search results
+        """
+
+        results = []
+
+        # Get list of required and prohibited tokens
+        must, mnot = Query.terms(query)
+
+        for uid, score in candidates:
+            if uid in sections:
+                sid, text = sections[uid]
 
                 # Add result if:
                 #   - all required tokens are present or there are not required tokens AND
@@ -73,7 +199,134 @@ class Query:
         return results
 
     @staticmethod
-    def highlights(results, topn):
+    def terms(query):
+        """
+        Gets the required (+term) and prohibited (-term) tokens in query.
+
+        Args:
+            query: query text
+
+        Returns:
+            (required tokens, prohibited tokens)
+        """
+
+        must = [token.strip("+") for token in query.split() if token.startswith("+") and len(token) > 1]
+        mnot = [token.strip("-") for token in query.split() if token.startswith("-") and len(token) > 1]
+
+        return must, mnot
+
+    @staticmethod
+    def intersect(cur, query, candidates):
+        """
+        Intersects search candidates with the sections in the full text index that match the required and prohibited
+        tokens in query. Candidates are returned unchanged when the full text index isn't attached.
+
+        Args:
+            cur: database cursor
+            query: query text
+            candidates: list of (section id, score)
+
+        Returns:
+            list of (section id, score)
+        """
+
+        must, mnot = Query.terms(query)
+        if (must or mnot) and FTS.attached(cur):
+            matches = FTS.filter(cur, [uid for uid, _ in candidates], must, mnot)
+            if matches is not None:
+                return [(uid, score) for uid, score in candidates if uid in matches]
+
+        return candidates
+
+    @staticmethod
+    def rank(embeddings, cur, query, ids, sections):
+        """
+        Ranks sections by similarity to query.
+
+        Args:
+            embeddings: embeddings model
+            cur: database cursor
+            query: query text or tokens
+            ids: list of section ids
+            sections: {section id: (article id, text)}
+
+        Returns:
+            list of (section id, score) sorted by score descending
+        """
+
+        ids = [uid for uid in ids if uid in sections]
+
+        # Scoring indexes compare tokens, use cached section tokens when available
+        if embeddings.isweighted():
+            tokens = Prepare.lookup(cur, ids)
+            data = [tokens[uid] if uid in tokens else Tokenizer.tokenize(sections[uid][1]) for uid in ids]
+        else:
+            data = [sections[uid][1] for uid in ids]
+
+        # Skip sections with no tokens, these sections aren't in the embeddings index
+        ids, data = [uid for uid, x in zip(ids, data) if x], [x for x in data if x]
+        if not ids:
+            return []
+
+        return [(ids[x], score) for x, score in embeddings.similarity(query, data)]
+
+    @staticmethod
+    def sections(cur, ids):
+        """
+        Resolves a list of section ids to section rows. Ids are looked up in batches of at most Query.BATCH ids.
+
+        Args:
+            cur: database cursor
+            ids: list of section ids
+
+        Returns:
+            {section id: (article id, text)}
+        """
+
+        return Query.lookup(cur, "SELECT Id, Article, Text FROM sections", ids)
+
+    @staticmethod
+    def metadata(cur, ids, columns):
+        """
+        Looks up article metadata for a list of article ids. Ids are looked up in batches of at most Query.BATCH ids.
+
+        Args:
+            cur: database cursor
+            ids: list of article ids
+            columns: list of article columns to select
+
+        Returns:
+            {article id: tuple of column values}
+        """
+
+        return Query.lookup(cur, f"SELECT Id, {', '.join(columns)} FROM articles", ids)
+
+    @staticmethod
+    def lookup(cur, query, ids):
+        """
+        Runs query for batches of ids. The query must select the id as the first column.
+
+        Args:
+            cur: database cursor
+            query: SELECT statement without a WHERE clause
+            ids: list of ids
+
+        Returns:
+            {id: tuple of remaining column values}
+        """
+
+        rows = {}
+        ids = list(ids)
+        for x in range(0, len(ids), Query.BATCH):
+            batch = ids[x : x + Query.BATCH]
+            cur.execute(f"{query} WHERE id IN ({', '.join(['?'] * len(batch))})", batch)
+            for row in cur:
+                rows[row[0]] = row[1:]
+
+        return rows
+
+    @staticmethod
+    def highlights(results, topn, cur=None, minhash=None):
         """
         Builds a list of highlights for the search results. Returns top ranked sections by importance
         over the result list.
@@ -81,6 +334,8 @@ class Query:
         Args:
             results: search results
             topn: number of highlights to extract
+            cur: optional database cursor, used to read cached section tokens and signatures
+            minhash: finds repetitive sections with MinHash LSH if True, defaults to Highlights.MINHASH
 
         Returns:
             top ranked sections
@@ -92,38 +347,84 @@ class Query:
             if score >= 0.1:
                 sections[text] = (uid, text)
 
+        # Read cached section tokens, if available
+        ids = [uid for uid, _ in sections.values()]
+        tokens = Prepare.lookup(cur, ids) if cur else None
+
+        # Read cached section signatures, if available
+        minhash = minhash if minhash is not None else Highlights.MINHASH
+        signatures = Prepare.signatures(cur, ids) if cur and minhash else None
+
         # Return up to 5 highlights
-        return Highlights.build(sections.values(), min(topn, 5))
+        return Highlights.build(sections.values(), min(topn, 5), tokens, minhash, signatures)
 
     @staticmethod
-    def documents(results, topn):
+    def documents(results, topn, minhash=False):
         """
-        Processes search results and groups by article.
+        Processes search results and groups by article. The topn articles with the best sections are selected and
+        returned in order of the sum of their section scores.
 
         Args:
             results: search results
             topn: number of documents to return
+            minhash: skips near-duplicate articles, such as preprint and published versions of the same paper, if True
 
         Returns:
-            results grouped by article
+            {article id: [(score, text)] sorted by score descending}, ordered by sum of scores descending
         """
 
-        documents = {}
+        documents, best = {}, {}
 
-        # Group by article
+        # Group unique sections by article and track the best score for each article
         for _, score, article, text in results:
             if article not in documents:
                 documents[article] = set()
+                best[article] = score
 
             documents[article].add((score, text))
+            best[article] = max(best[article], score)
 
-        # Sort based on section id, which preserves original order
-        for uid in documents:
-            documents[uid] = sorted(list(documents[uid]), reverse=True)
+        # Get documents with top n best sections and sort sections by score
+        ids = Query.unique(documents, best, topn) if minhash else heapq.nlargest(topn, best, key=best.get)
+        documents = {uid: sorted(documents[uid], reverse=True) for uid in ids}
 
-        # Get documents with top n best sections
-        topn = sorted(documents, key=lambda k: max(x[0] for x in documents[k]), reverse=True)[:topn]
-        return {uid: documents[uid] for uid in topn}
+        # Order documents by sum of section scores
+        return dict(sorted(documents.items(), key=lambda item: sum(score for score, _ in item[1]), reverse=True))
+
+    @staticmethod
+    def unique(documents, best, topn):
+        """
+        Selects the topn articles with the best sections, skipping near-duplicate articles. An article is a near-duplicate
+        when its best section is similar to a section of a higher ranked article. Similar sections are found with MinHash
+        LSH and confirmed with the Jaccard index of their tokens.
+
+        Args:
+            documents: {article id: set of (score, text)}
+            best: {article id: best section score}
+            topn: number of documents to return
+
+        Returns:
+            list of article ids
+        """
+
+        index, tokens, ids = MinHash(), {}, []
+        for uid in sorted(best, key=best.get, reverse=True):
+            if len(ids) == topn:
+                break
+
+            # Compare best section to sections of selected articles sharing a LSH bucket
+            text = max(documents[uid])[1]
+            terms = Highlights.tokenize(text)
+            if all(Highlights.jaccardIndex(tokens[candidate], terms) < Query.DUPLICATE for candidate in index.query(MinHash.signature(terms))):
+                ids.append(uid)
+
+                # Add article sections to the LSH index
+                for _, text in documents[uid]:
+                    if text not in tokens:
+                        tokens[text] = Highlights.tokenize(text)
+                        index.insert(text, MinHash.signature(tokens[text]))
+
+        return ids
 
     @staticmethod
     def all(cur):
@@ -190,9 +491,10 @@ class Query:
         return None
 
     @staticmethod
+    @lru_cache(maxsize=TEXTCACHE)
     def text(text):
         """
-        Formats match text.
+        Formats match text. Results are cached, the same sections are often formatted multiple times in a report.
 
         Args:
             text: input text
@@ -203,18 +505,18 @@ class Query:
 
         if text:
             # Remove reference links ([1], [2], etc)
-            text = re.sub(r"\s*[\[(][0-9, ]+[\])]\s*", " ", text)
+            text = Query.REFERENCES.sub(" ", text)
 
             # Remove •
             text = text.replace("•", "")
 
             # Remove http links
-            text = re.sub(r"http.+?\s", " ", text)
+            text = Query.LINKS.sub(" ", text)
 
         return text
 
     @staticmethod
-    def query(embeddings, db, query, topn, threshold):
+    def query(embeddings, db, query, topn, threshold, cache=None):
         """
         Executes a query against the embeddings model.
 
@@ -224,6 +526,7 @@ class Query:
             query: query string
             topn: number of query results
             threshold: query match score threshold
+            cache: optional ResultCache for search results
         """
 
         # Default to 10 results if not specified
@@ -239,10 +542,10 @@ class Query:
             console.print()
 
             # Execute query
-            results = Query.search(embeddings, cur, query, topn, threshold)
+            results = Query.search(embeddings, cur, query, topn, threshold, cache=cache)
 
             # Extract top sections as highlights
-            highlights = Query.highlights(results, int(topn / 5))
+            highlights = Query.highlights(results, int(topn / 5), cur)
             if highlights:
                 console.print("[deep_sky_blue1]Highlights[/deep_sky_blue1]")
                 for highlight in highlights:
@@ -260,13 +563,12 @@ class Query:
             console.print("[deep_sky_blue1]Articles[/deep_sky_blue1]")
             console.print()
 
-            # Print each result, sorted by max score descending
-            for uid in sorted(documents, key=lambda k: sum(x[0] for x in documents[k]), reverse=True):
-                cur.execute(
-                    "SELECT Title, Published, Publication, Entry, Id, Reference FROM articles WHERE id = ?",
-                    [uid],
-                )
-                article = cur.fetchone()
+            # Get article metadata
+            articles = Query.metadata(cur, documents, ["Title", "Published", "Publication", "Entry", "Id", "Reference"])
+
+            # Print each result, sorted by sum of scores descending
+            for uid, sections in documents.items():
+                article = articles[uid]
 
                 console.print(f"Title: {article[0]}", highlight=False)
                 console.print(f"Published: {Query.date(article[1])}", highlight=False)
@@ -276,7 +578,7 @@ class Query:
                 console.print(f"Reference: {article[5]}")
 
                 # Print top matches
-                for score, text in documents[uid]:
+                for score, text in sections:
                     console.print(
                         f"[bright_blue] - ({score:.4f}): {Query.text(text)}[/bright_blue]",
                         highlight=False,
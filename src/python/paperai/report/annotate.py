@@ -6,6 +6,8 @@ import os
 import os.path
 import re
 
+from functools import lru_cache
+
 from txtmarker.factory import Factory
 
 from ..query import Query
@@ -18,6 +20,34 @@ class Annotate(Report):
     Report writer for overlaying annotations on source PDFs. This format requires access to original PDFs.
     """
 
+    # Text cleanup patterns
+    PATTERNS = [
+        # Remove emails
+        r"\w+@\w+(\.[a-z]{2,})+",
+        # Remove urls
+        r"http(s)?\:\/\/\S+",
+        # Remove single characters repeated at least 3 times (ex. j o u r n a l)
+        r"(^|\s)(\w\s+){3,}",
+        # Remove citations references (ex. [3] [4] [5])
+        r"(\[\d+\]\,?\s?){3,}(\.|\,)?",
+        # Remove citations references (ex. [3, 4, 5])
+        r"\[[\d\,\s]+\]",
+        # Remove citations references (ex. (NUM1) repeated at least 3 times with whitespace
+        r"(\(\d+\)\s){3,}",
+    ]
+
+    # Combined text cleanup pattern
+    PATTERN = re.compile("|".join([f"({p})" for p in PATTERNS]))
+
+    # Extra spacing
+    SPACING = re.compile(r" {2,}|\.{2,}")
+
+    # Non-alphanumeric characters
+    ALPHANUMERIC = re.compile(r"[^A-Za-z0-9]")
+
+    # Maximum number of formatted text spans cached
+    FORMATCACHE = 16384
+
     def __init__(self, embeddings, db, options):
         """
         Creates a new report.
@@ -124,9 +154,12 @@ class Annotate(Report):
             # Annotate file
             highlighter.highlight(match[0], output, highlights)
 
-    def formatter(self, text):
+    @staticmethod
+    @lru_cache(maxsize=FORMATCACHE)
+    def formatter(text):
         """
         Custom formatter that is passed to PDF Annotation method. This logic maps data cleansing logic in paperetl.
+        Results are cached, the same PDF text spans are formatted for each annotation.
 
         Reference: https://github.com/neuml/paperetl/blob/master/src/python/paperetl/text.py
 
@@ -137,39 +170,15 @@ class Annotate(Report):
             clean text
         """
 
-        # List of patterns
-        patterns = []
-
-        # Remove emails
-        patterns.append(r"\w+@\w+(\.[a-z]{2,})+")
-
-        # Remove urls
-        patterns.append(r"http(s)?\:\/\/\S+")
-
-        # Remove single characters repeated at least 3 times (ex. j o u r n a l)
-        patterns.append(r"(^|\s)(\w\s+){3,}")
-
-        # Remove citations references (ex. [3] [4] [5])
-        patterns.append(r"(\[\d+\]\,?\s?){3,}(\.|\,)?")
-
-        # Remove citations references (ex. [3, 4, 5])
-        patterns.append(r"\[[\d\,\s]+\]")
-
-        # Remove citations references (ex. (NUM1) repeated at least 3 times with whitespace
-        patterns.append(r"(\(\d+\)\s){3,}")
-
-        # Build regex pattern
-        pattern = re.compile("|".join([f"({p})" for p in patterns]))
-
-        text = pattern.sub(" ", text)
+        text = Annotate.PATTERN.sub(" ", text)
 
         # Clean/transform text
-        text = pattern.sub(" ", text)
+        text = Annotate.PATTERN.sub(" ", text)
 
         # Remove extra spacing either caused by replacements or already in text
-        text = re.sub(r" {2,}|\.{2,}", " ", text)
+        text = Annotate.SPACING.sub(" ", text)
 
         # Limit to alphanumeric characters
-        text = re.sub(r"[^A-Za-z0-9]", "", text)
+        text = Annotate.ALPHANUMERIC.sub("", text)
 
         return text
@@ -2,11 +2,10 @@
 Report module
 """
 
-import regex as re
-
 from txtai.pipeline import Labels, RAG, Similarity, Tokenizer
 
 from ..index import Index
+from ..prepare import Prepare
 from ..query import Query
 
 from .column import Column
@@ -31,6 +30,9 @@ class Report:
         self.embeddings = embeddings
         self.cur = db.cursor()
 
+        # Filter sections in SQL when section eligibility columns are available
+        self.prepared = Prepare.exists(self.cur)
+
         # Report options
         self.options = options
 
@@ -42,7 +44,7 @@ class Report:
         self.labels = Labels(model=self.similarity) if self.similarity else None
 
         # Create RAG pipeline arguments without report options
-        args = {x: options[x] for x in options if x not in ["topn", "render", "path", "qa", "indir", "threshold"]}
+        args = {x: options[x] for x in options if x not in ["topn", "render", "path", "qa", "indir", "threshold", "adaptive", "deduplicate"]}
 
         # Retrieval Augmented Generation (RAG) pipeline for calculated fields
         self.rag = RAG(
@@ -64,19 +66,32 @@ class Report:
         # Default to 50 documents if not specified
         topn = options.get("topn", 50)
 
-        for name, config in queries:
+        # Query for best matches for all queries
+        metrics = {}
+        searches = Query.batchsearch(
+            self.embeddings,
+            self.cur,
+            [config["query"] for _, config in queries],
+            topn,
+            options.get("threshold"),
+            options.get("adaptive", False),
+            metrics,
+        )
+
+        for (name, config), results, candidates in zip(queries, searches, metrics["candidates"]):
             query = config["query"]
             columns = config["columns"]
 
+            # Print number of candidates fetched with adaptive search
+            if options.get("adaptive"):
+                print(f"Fetched {candidates} candidates for {name}")
+
             # Write query string
             self.query(output, name, query)
 
             # Write separator
             self.separator(output)
 
-            # Query for best matches
-            results = Query.search(self.embeddings, self.cur, query, topn, options.get("threshold"))
-
             # Generate highlights section
             self.section(output, "Highlights")
 
@@ -109,14 +124,15 @@ class Report:
         """
 
         # Extract top sections as highlights
-        for highlight in Query.highlights(results, topn):
-            # Get matching article
-            uid = [article for _, _, article, text in results if text == highlight][0]
-            self.cur.execute("SELECT Authors, Reference FROM articles WHERE id = ?", [uid])
-            article = self.cur.fetchone()
+        highlights = Query.highlights(results, topn, self.cur, self.options.get("deduplicate"))
 
+        # Get matching articles
+        uids = [[article for _, _, article, text in results if text == highlight][0] for highlight in highlights]
+        articles = Query.metadata(self.cur, set(uids), ["Authors", "Reference"])
+
+        for uid, highlight in zip(uids, highlights):
             # Write out highlight row
-            self.highlight(output, article, highlight)
+            self.highlight(output, articles.get(uid), highlight)
 
     def articles(self, output, topn, metadata, results):
         """
@@ -133,18 +149,16 @@ class Report:
         _, query, _ = metadata
 
         # Retrieve list of documents
-        documents = Query.all(self.cur) if query == "*" else Query.documents(results, topn)
+        documents = Query.all(self.cur) if query == "*" else Query.documents(results, topn, self.options.get("deduplicate", False))
+
+        # Get article metadata
+        articles = Query.metadata(self.cur, documents, ["Published", "Title", "Reference", "Publication", "Source", "Entry", "Id"])
 
         # Collect matching rows
         rows = []
 
         for x, uid in enumerate(documents):
-            # Get article metadata
-            self.cur.execute(
-                "SELECT Published, Title, Reference, Publication, Source, Entry, Id FROM articles WHERE id = ?",
-                [uid],
-            )
-            article = self.cur.fetchone()
+            article = articles.get(uid)
 
             if x and x % 100 == 0:
                 print(f"Processed {x} documents", end="\r")
@@ -315,13 +329,23 @@ class Report:
             list of section text elements
         """
 
+        # Only filter sections by name for scoring indexes
+        filtered = self.embeddings.isweighted() and not self.options.get("allsections")
+
+        if self.prepared:
+            # Retrieve indexed document text for article, filter sections with at least 1 token
+            query = Index.SECTION_QUERY + " WHERE article = ? AND Tokens > 0" + (" AND Eligible = 1" if filtered else "") + " ORDER BY id"
+            self.cur.execute(query, [uid])
+
+            return [(sid, text) for sid, _, text in self.cur.fetchall()]
+
         # Retrieve indexed document text for article
         self.cur.execute(Index.SECTION_QUERY + " WHERE article = ? ORDER BY id", [uid])
 
         # Get list of document text sections
         sections = []
         for sid, name, text in self.cur.fetchall():
-            if not self.embeddings.isweighted() or not name or not re.search(Index.SECTION_FILTER, name.lower()) or self.options.get("allsections"):
+            if not filtered or Prepare.eligible(name):
                 # Check that section has at least 1 token
                 if Tokenizer.tokenize(text):
                     sections.append((sid, text))
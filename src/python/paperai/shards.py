@@ -0,0 +1,234 @@
+"""
+Shards module
+"""
+
+import heapq
+import json
+import os
+import shutil
+import sqlite3
+
+from contextlib import ExitStack
+
+import numpy as np
+
+
+class Shards:
+    """
+    Splits the articles eligible for indexing into shards by article id range. Vectors for each shard are encoded
+    separately and merged into a single embeddings index. Shard state is stored in a shared directory, which allows
+    shards to be encoded by multiple processes or machines.
+    """
+
+    def __init__(self, path, count, parameters):
+        """
+        Creates a new shards instance.
+
+        Args:
+            path: shards directory
+            count: number of shards
+            parameters: index parameters, shards can only be merged when built with the same parameters
+        """
+
+        self.path = path
+        self.count = count
+
+        # Fingerprint of index parameters
+        self.parameters = json.dumps(parameters, sort_keys=True, default=str)
+
+        # Article id lower bounds for each shard
+        self.bounds = None
+
+    def plan(self, dbfile, query):
+        """
+        Splits eligible articles into shards with close to the same number of articles. An existing plan is reused
+        when it was created with the same shard count and index parameters, otherwise shard state is cleared.
+
+        Args:
+            dbfile: articles.sqlite file
+            query: query that selects the ids of articles eligible for indexing
+        """
+
+        # Load existing plan
+        if os.path.exists(self.file("shards.json")):
+            with open(self.file("shards.json"), "r", encoding="utf-8") as f:
+                plan = json.load(f)
+
+            if plan["count"] == self.count and plan["parameters"] == self.parameters:
+                self.bounds = plan["bounds"]
+                return
+
+        self.clear()
+        os.makedirs(self.path, exist_ok=True)
+
+        # Split sorted article ids into shards
+        db = sqlite3.connect(dbfile)
+        ids = [row[0] for row in db.execute(f"SELECT Id FROM articles WHERE id IN ({query}) AND id IN (SELECT article FROM sections) ORDER BY Id")]
+        db.close()
+
+        self.bounds = [ids[(len(ids) * x) // self.count] if ids else "" for x in range(self.count)]
+
+        # Write plan
+        self.write("shards.json", {"count": self.count, "parameters": self.parameters, "bounds": self.bounds})
+
+    def articles(self, dbfile, query, shard):
+        """
+        Gets the eligible article ids for a shard.
+
+        Args:
+            dbfile: articles.sqlite file
+            query: query that selects the ids of articles eligible for indexing
+            shard: shard index
+
+        Returns:
+            list of article ids
+        """
+
+        # Shard article id range, last shard has no upper bound
+        query = f"SELECT Id FROM articles WHERE id IN ({query}) AND id IN (SELECT article FROM sections) AND id >= ?"
+        args = [self.bounds[shard]]
+        if shard < self.count - 1:
+            query += " AND id < ?"
+            args.append(self.bounds[shard + 1])
+
+        db = sqlite3.connect(dbfile)
+        ids = [row[0] for row in db.execute(query, args)]
+        db.close()
+
+        return ids
+
+    def file(self, name):
+        """
+        Gets the full path to a file in the shards directory.
+
+        Args:
+            name: file name
+
+        Returns:
+            full path
+        """
+
+        return os.path.join(self.path, name)
+
+    def directory(self, shard):
+        """
+        Gets the vectors directory for a shard.
+
+        Args:
+            shard: shard index
+
+        Returns:
+            shard directory
+        """
+
+        return self.file(f"shard{shard}")
+
+    def complete(self, shard):
+        """
+        Checks if a shard is complete.
+
+        Args:
+            shard: shard index
+
+        Returns:
+            True if the shard is complete, False otherwise
+        """
+
+        return os.path.exists(os.path.join(self.directory(shard), "ids.json"))
+
+    def save(self, shard, ids):
+        """
+        Marks a shard as complete. Saves the ids of the vectors encoded for the shard.
+
+        Args:
+            shard: shard index
+            ids: list of ids in vectors order
+        """
+
+        self.write(os.path.join(f"shard{shard}", "ids.json"), ids)
+
+    def merge(self, model, vectorsid, batch):
+        """
+        Merges the vectors of all shards into a single vectors checkpoint directory. Shard vectors are merged in id order,
+        which is the order of a full index build, and rewritten in batches of the embeddings index batch size. The merged
+        directory can be passed as the checkpoint to an embeddings index build, which then reads vectors in place of
+        encoding documents.
+
+        Args:
+            model: vectors model
+            vectorsid: vectors uid for the current configuration
+            batch: embeddings index batch size
+
+        Returns:
+            (merged vectors checkpoint directory, list of ids in vectors order)
+        """
+
+        path, ids = self.file("merge"), []
+        os.makedirs(path, exist_ok=True)
+
+        with ExitStack() as stack, open(os.path.join(path, vectorsid), "wb") as output:
+            # Open shard vectors spool files
+            spools = [stack.enter_context(open(os.path.join(self.directory(shard), vectorsid), "rb")) for shard in range(self.count)]
+
+            rows = []
+            for uid, embeddings in heapq.merge(*[self.rows(model, shard, spool) for shard, spool in enumerate(spools)], key=lambda x: x[0]):
+                ids.append(uid)
+                rows.append(embeddings)
+
+                # Write full batches
+                if len(rows) == batch:
+                    model.saveembeddings(output, np.array(rows))
+                    rows = []
+
+            # Write final batch
+            if rows:
+                model.saveembeddings(output, np.array(rows))
+
+        return path, ids
+
+    def rows(self, model, shard, spool):
+        """
+        Reads the ids and vectors of a shard. This method is a generator and will yield a (id, vector) row at a time.
+
+        Args:
+            model: vectors model
+            shard: shard index
+            spool: open shard vectors spool file
+        """
+
+        with open(os.path.join(self.directory(shard), "ids.json"), "r", encoding="utf-8") as f:
+            ids = json.load(f)
+
+        offset = 0
+        while True:
+            try:
+                embeddings = model.loadembeddings(spool)
+            except EOFError:
+                return
+
+            yield from zip(ids[offset : offset + embeddings.shape[0]], embeddings)
+            offset += embeddings.shape[0]
+
+    def clear(self):
+        """
+        Deletes all shard state.
+        """
+
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def write(self, name, data):
+        """
+        Writes a JSON file to the shards directory. The file is only replaced after it's fully written.
+
+        Args:
+            name: file name
+            data: JSON data
+        """
+
+        path = self.file(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+        os.replace(f"{path}.tmp", path)
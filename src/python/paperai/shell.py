@@ -2,10 +2,11 @@
 paperai query shell module.
 """
 
-import sys
+import argparse
 
 from cmd import Cmd
 
+from .cache import ResultCache
 from .models import Models
 from .query import Query
 
@@ -15,7 +16,7 @@ class Shell(Cmd):
     paperai query shell.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, cache=False):
         super().__init__()
 
         self.intro = "paperai query shell"
@@ -23,31 +24,53 @@ class Shell(Cmd):
 
         self.embeddings = None
         self.db = None
+        self.cache = cache
         self.path = path
 
     def preloop(self):
         # Load embeddings and articles.sqlite
         self.embeddings, self.db = Models.load(self.path)
 
+        # Cache results of repeated queries, if enabled
+        self.cache = ResultCache(self.path) if self.cache else None
+
     def postloop(self):
         Models.close(self.db)
 
     def default(self, line):
-        Query.query(self.embeddings, self.db, line, None, None)
+        Query.query(self.embeddings, self.db, line, None, None, self.cache)
+
+    # pylint: disable=W0613
+    def do_stats(self, line):
+        """
+        Prints result cache hits, misses and size.
+        """
 
+        if self.cache:
+            stats = self.cache.stats()
+            print(f"Result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['size']} entries")
+        else:
+            print("Result cache is disabled, start the shell with --cache to enable it")
 
-def main(path=None):
+
+def main(path=None, cache=False):
     """
     Shell execution loop.
 
     Args:
         path: model path
+        cache: caches results of repeated queries if True
     """
 
-    if not path and len(sys.argv) > 1:
-        path = sys.argv[1]
+    if not path:
+        parser = argparse.ArgumentParser(description="paperai query shell")
+        parser.add_argument("path", nargs="?", help="model path")
+        parser.add_argument("--cache", action="store_true", help="caches results of repeated queries")
+        args = parser.parse_args()
+
+        path, cache = args.path, cache or args.cache
 
-    Shell(path).cmdloop()
+    Shell(path, cache).cmdloop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+"""
+Spill module
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+class Spill:
+    """
+    Compact on-disk cache of tokenized documents. Tokens are stored as a memory-mapped array of token ids along with
+    document offsets. This allows replaying a tokenized document stream without reading and tokenizing the source data again.
+    """
+
+    def __init__(self, path=None):
+        """
+        Creates a new spill cache.
+
+        Args:
+            path: parent directory for spill files, uses the default temporary directory if None
+        """
+
+        # Working directory for spill files
+        self.path = tempfile.mkdtemp(prefix="spill", dir=path)
+
+        # Token vocabulary - token to token id and token id to token
+        self.vocab, self.tokens = {}, []
+
+        # Document ids and token offsets
+        self.ids, self.offsets = [], [0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __call__(self, documents):
+        """
+        Writes documents to this spill cache. This method is a generator that passes through each document, which
+        allows building the cache while the documents are consumed.
+
+        Args:
+            documents: iterable of (id, tokens, tags)
+        """
+
+        with open(os.path.join(self.path, "tokens"), "wb") as output:
+            for document in documents:
+                uid, tokens, _ = document
+
+                # Map tokens to token ids, add new tokens to vocabulary
+                ids = []
+                for token in tokens:
+                    if token not in self.vocab:
+                        self.vocab[token] = len(self.tokens)
+                        self.tokens.append(token)
+
+                    ids.append(self.vocab[token])
+
+                # Write token ids and save offset
+                output.write(np.array(ids, dtype=np.uint32).tobytes())
+                self.ids.append(uid)
+                self.offsets.append(self.offsets[-1] + len(ids))
+
+                yield document
+
+    def __iter__(self):
+        """
+        Replays the documents stored in this spill cache.
+
+        Returns:
+            generator of (id, tokens, None)
+        """
+
+        # Memory-map token ids, zero length files can't be mapped
+        total = self.offsets[-1]
+        ids = np.memmap(os.path.join(self.path, "tokens"), dtype=np.uint32, mode="r", shape=(total,)) if total else np.array([], dtype=np.uint32)
+
+        for x, uid in enumerate(self.ids):
+            yield (uid, [self.tokens[i] for i in ids[self.offsets[x] : self.offsets[x + 1]].tolist()], None)
+
+    def __len__(self):
+        """
+        Number of documents in this spill cache.
+
+        Returns:
+            number of documents
+        """
+
+        return len(self.ids)
+
+    def close(self):
+        """
+        Closes this spill cache and deletes all spill files.
+        """
+
+        shutil.rmtree(self.path, ignore_errors=True)
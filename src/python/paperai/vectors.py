@@ -2,14 +2,20 @@
 Vectors module
 """
 
+import argparse
+import glob
+import hashlib
+import json
 import os
 import os.path
-import sqlite3
-import sys
+import shutil
 import tempfile
 
 from staticvectors import StaticVectorsTrainer
-from txtai.pipeline import Tokenizer
+
+from .models import Models
+from .parallel import Parallel
+from .prepare import Prepare
 
 
 class RowIterator:
@@ -65,15 +71,15 @@ class RowIterator:
         """
 
         # Connection to database file
-        db = sqlite3.connect(dbfile)
+        db = Models.connect(dbfile)
         cur = db.cursor()
 
-        cur.execute("SELECT Text FROM sections")
+        RowIterator.query(cur, dbfile)
 
         count = 0
-        for section in cur:
+        for text, terms in cur:
             # Tokenize text
-            tokens = Tokenizer.tokenize(section[0])
+            tokens = Prepare.tokenize(text, terms)
 
             count += 1
             if count % 1000 == 0:
@@ -88,19 +94,44 @@ class RowIterator:
         # Free database resources
         db.close()
 
+    @staticmethod
+    def query(cur, dbfile):
+        """
+        Runs a query that selects (text, cached tokens) rows for all sections. Cached tokens are NULL when the token
+        cache is not available.
+
+        Args:
+            cur: database cursor
+            dbfile: path to SQLite file
+        """
+
+        # Select cached tokens when the token cache is available
+        if Prepare.attach(cur, dbfile):
+            cur.execute("SELECT Text, Terms FROM sections LEFT JOIN tokens.tokens USING (Id)")
+        else:
+            cur.execute("SELECT Text, NULL FROM sections")
+
 
 class Vectors:
     """
     Methods to build a FastText model.
     """
 
+    # Output buffer size for tokens file
+    BUFFER = 1024 * 1024
+
     @staticmethod
-    def tokens(dbfile):
+    def tokens(dbfile, workers=0, chunksize=1000):
         """
         Iterates over each row in dbfile and writes parsed tokens to a temporary file for processing.
 
+        When workers is set, chunks of rows are tokenized in a pool of worker processes. Lines are always written in
+        the same order as the rows are read.
+
         Args:
             dbfile: SQLite file to read
+            workers: number of worker processes used to tokenize rows, runs in current process if 0
+            chunksize: number of rows per chunk
 
         Returns:
             path to output file
@@ -108,18 +139,110 @@ class Vectors:
 
         tokens = None
 
+        # Connection to database file
+        db = Models.connect(dbfile)
+        cur = db.cursor()
+
+        RowIterator.query(cur, dbfile)
+
         # Stream tokens to temp working file
-        with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False) as output:
+        with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False, buffering=Vectors.BUFFER) as output:
             # Save file path
             tokens = output.name
 
-            for row in RowIterator(dbfile):
-                output.write(" ".join(row) + "\n")
+            count = 0
+            for lines, rows in Parallel.map(Vectors.lines, Parallel.chunks(cur, chunksize), workers):
+                output.write(lines)
+
+                count += rows
+                print(f"Streamed {count} documents", end="\r")
+
+            print(f"Iterated over {count} total rows")
+
+        # Free database resources
+        db.close()
 
         return tokens
 
     @staticmethod
-    def run(path, size, mincount, output):
+    def lines(rows):
+        """
+        Tokenizes a chunk of rows into lines of space separated tokens. Rows with no tokens parsed are skipped.
+
+        Args:
+            rows: list of (text, cached tokens) rows
+
+        Returns:
+            (lines, number of rows)
+        """
+
+        lines = []
+        for text, terms in rows:
+            tokens = Prepare.tokenize(text, terms)
+            if tokens:
+                lines.append(" ".join(tokens) + "\n")
+
+        return "".join(lines), len(rows)
+
+    @staticmethod
+    def fingerprint(dbfile):
+        """
+        Generates a fingerprint for a SQLite file. The fingerprint changes when sections are added or removed or when
+        the file is modified.
+
+        Args:
+            dbfile: SQLite file
+
+        Returns:
+            fingerprint
+        """
+
+        # Connection to database file
+        db = Models.connect(dbfile)
+        count, maxid = db.execute("SELECT count(*), max(id) FROM sections").fetchone()
+
+        # Free database resources
+        db.close()
+
+        stat = os.stat(dbfile)
+        data = {"count": count, "maxid": maxid, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+
+        return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def cached(dbfile, cache, workers=0, chunksize=1000):
+        """
+        Gets a tokens file from a cache directory. Builds and stores a new tokens file when the cache doesn't have a
+        tokens file for the current fingerprint of dbfile. Tokens files for other fingerprints are stale and removed.
+
+        Args:
+            dbfile: SQLite file to read
+            cache: cache directory
+            workers: number of worker processes used to tokenize rows
+            chunksize: number of rows per worker chunk
+
+        Returns:
+            path to tokens file
+        """
+
+        path = os.path.join(cache, f"tokens-{Vectors.fingerprint(dbfile)}.txt")
+        if os.path.exists(path):
+            print(f"Using cached tokens file {path}")
+            return path
+
+        # Remove stale tokens files
+        for stale in glob.glob(os.path.join(cache, "tokens-*.txt")):
+            os.remove(stale)
+
+        # Build tokens file and move into cache
+        os.makedirs(cache, exist_ok=True)
+        tokens = Vectors.tokens(dbfile, workers, chunksize)
+        shutil.move(tokens, path)
+
+        return path
+
+    @staticmethod
+    def run(path, size, mincount, output, workers=0, chunksize=1000, cache=None):
         """
         Builds a word vector model.
 
@@ -128,27 +251,36 @@ class Vectors:
             size: dimensions for fastText model
             mincount: minimum number of times a token must appear in input
             output: output file path
+            workers: number of worker processes used to tokenize rows
+            chunksize: number of rows per worker chunk
+            cache: optional cache directory, tokens files are kept in this directory and reused for the same input data
         """
 
         # Derive path to dbfile
         dbfile = os.path.join(path, "articles.sqlite")
 
-        # Stream tokens to temporary file
-        tokens = Vectors.tokens(dbfile)
+        # Stream tokens to temporary file or get tokens file from cache
+        tokens = Vectors.cached(dbfile, cache, workers, chunksize) if cache else Vectors.tokens(dbfile, workers, chunksize)
 
         # Build staticvectors model
         trainer = StaticVectorsTrainer()
         trainer(tokens, size=size, mincount=mincount, path=output)
 
         # Remove temporary tokens file
-        os.remove(tokens)
+        if not cache:
+            os.remove(tokens)
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Builds a paperai word vectors model")
+    parser.add_argument("path", nargs="?", help="model path")
+    parser.add_argument("output", nargs="?", help="output file path")
+    parser.add_argument("--size", type=int, default=300, help="dimensions for fastText model")
+    parser.add_argument("--mincount", type=int, default=4, help="minimum number of times a token must appear in input")
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes used to tokenize rows")
+    parser.add_argument("--chunksize", type=int, default=1000, help="number of rows per worker chunk")
+    parser.add_argument("--cache", help="directory used to keep and reuse tokens files")
+    args = parser.parse_args()
+
     # Create vector model
-    Vectors.run(
-        sys.argv[1] if len(sys.argv) > 1 else None,
-        300,
-        4,
-        sys.argv[2] if len(sys.argv) > 2 else None,
-    )
+    Vectors.run(args.path, args.size, args.mincount, args.output, args.workers, args.chunksize, args.cache)
@@ -0,0 +1,78 @@
+"""
+Cache module tests
+"""
+
+import os
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from paperai.cache import ResultCache
+
+
+class TestCache(unittest.TestCase):
+    """
+    Cache tests
+    """
+
+    def setUp(self):
+        """
+        Creates a model path with an index configuration file.
+        """
+
+        self.path = tempfile.mkdtemp()
+        self.config = os.path.join(self.path, "config.json")
+
+        with open(self.config, "w", encoding="utf-8") as output:
+            output.write("{}")
+
+    def testEviction(self):
+        """
+        Test least recently used results are evicted
+        """
+
+        cache = ResultCache(self.path, 2)
+        cache.put(ResultCache.key("a", 10, None), 1)
+        cache.put(ResultCache.key("b", 10, None), 2)
+
+        # Use a, b is least recently used
+        self.assertEqual(cache.get(ResultCache.key(" a ", 10, None)), 1)
+        cache.put(ResultCache.key("c", 10, None), 3)
+
+        self.assertIsNone(cache.get(ResultCache.key("b", 10, None)))
+        self.assertEqual(cache.get(ResultCache.key("c", 10, None)), 3)
+        self.assertEqual(cache.stats(), {"hits": 2, "misses": 1, "size": 2})
+
+    @patch("paperai.cache.time.monotonic")
+    def testExpire(self, monotonic):
+        """
+        Test results expire after the TTL
+        """
+
+        monotonic.return_value = 0
+        cache = ResultCache(self.path, ttl=60)
+        cache.put("key", 1)
+
+        monotonic.return_value = 30
+        self.assertEqual(cache.get("key"), 1)
+
+        monotonic.return_value = 61
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def testInvalidate(self):
+        """
+        Test cache is cleared when the saved index changes
+        """
+
+        cache = ResultCache(self.path)
+        cache.put("key", 1)
+        self.assertEqual(cache.get("key"), 1)
+
+        # Save index
+        stat = os.stat(self.config)
+        os.utime(self.config, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+
+        self.assertIsNone(cache.get("key"))
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 0})
@@ -2,9 +2,12 @@
 Export module tests
 """
 
+import gzip
+import json
+import os
 import unittest
 
-from paperai.export import Export
+from paperai.export import Export, PYARROW
 
 # pylint: disable=C0411
 from utils import Utils
@@ -22,3 +25,53 @@ class TestExport(unittest.TestCase):
 
         Export.run(Utils.PATH + "/export.txt", Utils.PATH)
         self.assertEqual(Utils.linecount(Utils.PATH + "/export.txt"), 29841)
+
+    def testJSONL(self):
+        """
+        Test JSONL export run
+        """
+
+        Export.run(Utils.PATH + "/export.jsonl", Utils.PATH, kind="jsonl")
+
+        with open(Utils.PATH + "/export.jsonl", "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+
+        self.assertEqual(list(rows[0].keys()), ["id", "article", "name", "text"])
+        self.assertEqual(len(rows), len({row["id"] for row in rows}))
+
+    @unittest.skipIf(not PYARROW, "pyarrow is not available")
+    def testParquet(self):
+        """
+        Test Parquet export run
+        """
+
+        # pylint: disable=C0415
+        import pyarrow.parquet as pq
+
+        Export.run(Utils.PATH + "/export.jsonl", Utils.PATH, kind="jsonl")
+        Export.run(Utils.PATH + "/export.parquet", Utils.PATH, kind="parquet")
+
+        with open(Utils.PATH + "/export.jsonl", "r", encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+
+        table = pq.read_table(Utils.PATH + "/export.parquet")
+        self.assertEqual(table.column_names, ["id", "article", "name", "text"])
+        self.assertEqual(table.to_pylist(), rows)
+
+    def testShards(self):
+        """
+        Test sharded and compressed export run
+        """
+
+        Export.run(Utils.PATH + "/export.shards.txt", Utils.PATH, 2, "gz")
+
+        with open(Utils.PATH + "/export.shards.manifest.json", "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        self.assertEqual(manifest["lines"], 29841)
+        self.assertEqual(len(manifest["shards"]), 2)
+
+        # Line counts in manifest match shard files
+        for shard in manifest["shards"]:
+            with gzip.open(os.path.join(Utils.PATH, shard["file"]), "rt", encoding="utf-8") as f:
+                self.assertEqual(len(f.readlines()), shard["lines"])
@@ -0,0 +1,99 @@
+"""
+FTS module tests
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from paperai.fts import FTS
+from paperai.index import Index
+
+# pylint: disable=C0411
+from utils import Utils
+
+
+class TestFTS(unittest.TestCase):
+    """
+    FTS tests
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        Builds a full text index for a copy of the test database.
+        """
+
+        cls.path = os.path.join(tempfile.gettempdir(), "paperai.fts")
+        os.makedirs(cls.path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, cls.path)
+
+        Index.fulltext(cls.path, 0, 0, True)
+
+        cls.db = sqlite3.connect(os.path.join(cls.path, "articles.sqlite"))
+        FTS.attach(cls.db, os.path.join(cls.path, "articles.sqlite"))
+
+    @classmethod
+    def tearDownClass(cls):
+        """
+        Closes the database connection.
+        """
+
+        cls.db.close()
+
+    def testMatch(self):
+        """
+        Test matching required and prohibited terms
+        """
+
+        ids = FTS.match(self.db, ["Hypertension"], ["smoking"])
+        self.assertTrue(ids)
+
+        # Matches have the same case-insensitive substring semantics as the query term syntax
+        for uid in ids:
+            text = self.db.execute("SELECT Text FROM sections WHERE id = ?", [uid]).fetchone()[0].lower()
+            self.assertIn("hypertension", text)
+            self.assertNotIn("smoking", text)
+
+        # Unsupported queries
+        self.assertIsNone(FTS.match(self.db, [], ["smoking"]))
+        self.assertIsNone(FTS.match(self.db, ["ab"], []))
+
+    def testFilter(self):
+        """
+        Test filtering a list of section ids
+        """
+
+        ids = [row[0] for row in self.db.execute("SELECT rowid FROM fts.sections LIMIT 500")]
+        matches = FTS.filter(self.db, ids, ["risk"], ["smoking"])
+
+        for uid in ids:
+            text = self.db.execute("SELECT Text FROM sections WHERE id = ?", [uid]).fetchone()[0].lower()
+            self.assertEqual(uid in matches, "risk" in text and "smoking" not in text)
+
+    def testUpdate(self):
+        """
+        Test deleting and upserting sections
+        """
+
+        path = os.path.join(tempfile.gettempdir(), "paperai.fts.update")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(os.path.join(self.path, FTS.FILE), path)
+
+        db = sqlite3.connect(os.path.join(path, "articles.sqlite"))
+        FTS.attach(db, os.path.join(path, "articles.sqlite"))
+
+        ids = FTS.match(db, ["hypertension"], [])
+        uid = db.execute("SELECT max(rowid) FROM fts.sections").fetchone()[0]
+        db.close()
+
+        # Delete the first match and upsert new text for an existing and a new section
+        FTS.update(path, [ids[0]], [(ids[1], "no match"), (uid + 1, "hypertension")])
+
+        db = sqlite3.connect(os.path.join(path, "articles.sqlite"))
+        FTS.attach(db, os.path.join(path, "articles.sqlite"))
+
+        self.assertEqual(sorted(FTS.match(db, ["hypertension"], [])), sorted(ids[2:] + [uid + 1]))
+        db.close()
@@ -0,0 +1,73 @@
+"""
+Highlights module tests
+"""
+
+import unittest
+
+from paperai.highlights import Highlights
+from paperai.models import Models
+
+# pylint: disable=C0411
+from utils import Utils
+
+
+class TestHighlights(unittest.TestCase):
+    """
+    Highlights tests
+    """
+
+    def testBackends(self):
+        """
+        Test the sparse matrix and networkx textrank backends return the same scores
+        """
+
+        db = Models.connect(Utils.DBFILE)
+        sections = db.execute("SELECT Id, Text FROM sections ORDER BY Id LIMIT 250").fetchall()
+        Models.close(db)
+
+        networkx = dict(Highlights.textrank(sections, backend="networkx"))
+        matrix = dict(Highlights.textrank(sections, backend="sparse"))
+
+        self.assertEqual(set(networkx), set(matrix))
+        for uid, score in matrix.items():
+            self.assertAlmostEqual(score, networkx[uid], places=9)
+
+    def testEmpty(self):
+        """
+        Test textrank with sections that don't share any terms
+        """
+
+        sections = [(0, "Hypertension risk"), (1, "Smoking"), (2, "")]
+        for _, score in Highlights.textrank(sections):
+            self.assertAlmostEqual(score, 1 / 3)
+
+    def testBuild(self):
+        """
+        Test highlights skip repetitive sections
+        """
+
+        sections = [
+            (0, "Hypertension is a risk factor for severe disease"),
+            (1, "Hypertension is a risk factor for severe disease outcomes"),
+            (2, "Diabetes increases the risk of severe disease"),
+            (3, "Smoking was not associated with mortality"),
+        ]
+
+        highlights = Highlights.build(sections, 2)
+
+        # Returns topn sections in input order, near duplicate sections are only returned once
+        self.assertEqual(len(highlights), 2)
+        self.assertFalse(sections[0][1] in highlights and sections[1][1] in highlights)
+        self.assertEqual(highlights, [text for _, text in sections if text in highlights])
+
+    def testMinHash(self):
+        """
+        Test highlights with MinHash LSH
+        """
+
+        db = Models.connect(Utils.DBFILE)
+        sections = db.execute("SELECT Id, Text FROM sections ORDER BY Id LIMIT 250").fetchall()
+        Models.close(db)
+
+        # Repetitive sections are found with high probability, results match for this data
+        self.assertEqual(Highlights.build(sections, 5, minhash=True), Highlights.build(sections, 5, minhash=False))
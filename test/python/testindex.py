@@ -3,10 +3,19 @@ Index module tests
 """
 
 import os
+import shutil
+import sqlite3
 import tempfile
 import unittest
 
+from unittest.mock import patch
+
+from txtai.embeddings import Embeddings
+
+from paperai.checkpoint import Checkpoint
+from paperai.fts import FTS
 from paperai.index import Index
+from paperai.manifest import Manifest
 
 # pylint: disable=C0411
 from utils import Utils
@@ -17,6 +26,41 @@ class TestIndex(unittest.TestCase):
     Index tests
     """
 
+    def testCheckpoint(self):
+        """
+        Test checkpointed index builds
+        """
+
+        path = os.path.join(tempfile.gettempdir(), "paperai.checkpoint")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        # Create a checkpoint with partial scoring state
+        embeddings = Embeddings(Index.config(Utils.VECTORFILE))
+        checkpoint = Checkpoint(os.path.join(path, "checkpoint"), 0, False, Index.parameters(dbfile, Utils.VECTORFILE, 10, 0))
+        embeddings.scoring.insert([document for document in next(Index.chunks(Utils.DBFILE, 10, 0, True, chunksize=100)) if document[1]])
+        checkpoint.save(embeddings.scoring, 100)
+
+        # Resuming with different parameters fails
+        with self.assertRaises(ValueError):
+            Checkpoint(os.path.join(path, "checkpoint"), 0, True, Index.parameters(dbfile, Utils.VECTORFILE, 20, 0))
+
+        # Resume build and check checkpoint is removed
+        Index.run(path, Utils.VECTORFILE, 10, checkpoint=100, resume=True)
+        self.assertFalse(os.path.exists(os.path.join(path, "checkpoint")))
+
+        embeddings = Embeddings()
+        embeddings.load(path)
+        self.assertEqual(embeddings.count(), len(list(Index.stream(Utils.DBFILE, 10, 0, True))))
+
+        # Parameters change when sections are added, which prevents resuming with a different section stream
+        parameters = Index.parameters(dbfile, Utils.VECTORFILE, 10, 0)
+        with sqlite3.connect(dbfile) as db:
+            db.execute("INSERT INTO sections (Id, Article, Name, Text) SELECT max(id) + 1, Article, Name, Text FROM sections")
+
+        self.assertNotEqual(Index.parameters(dbfile, Utils.VECTORFILE, 10, 0), parameters)
+
     def testConfig(self):
         """
         Test configuration
@@ -43,6 +87,38 @@ class TestIndex(unittest.TestCase):
         )
         self.assertEqual(Index.config(None), None)
 
+    def testPlan(self):
+        """
+        Test section query plan is index driven
+        """
+
+        with sqlite3.connect(Utils.DBFILE) as db:
+            cur = db.cursor()
+            query, _ = Index.query(cur, 10, 10, True)
+
+            plan = [row[-1] for row in cur.execute(f"EXPLAIN QUERY PLAN {query}")]
+
+        # Eligible articles are looked up by primary key, no correlated subqueries or sorts
+        self.assertTrue(any(step.startswith("SEARCH") and "indexed" in step and "INDEX" in step for step in plan))
+        self.assertFalse(any("CORRELATED" in step or "TEMP B-TREE" in step or "citations" in step for step in plan))
+
+    def testShards(self):
+        """
+        Test sharded index builds
+        """
+
+        path = os.path.join(tempfile.gettempdir(), "paperai.shards")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+
+        # Build index with 3 shards and check shard state is removed
+        Index.run(path, Utils.VECTORFILE, 10, shards=3)
+        self.assertFalse(os.path.exists(os.path.join(path, "shards")))
+
+        embeddings = Embeddings()
+        embeddings.load(path)
+        self.assertEqual(embeddings.count(), len(list(Index.stream(Utils.DBFILE, 10, 0, True))))
+
     def testStream(self):
         """
         Test row streaming
@@ -56,3 +132,85 @@ class TestIndex(unittest.TestCase):
 
         # Partial index stream - top n documents by citation count
         self.assertEqual(len(list(Index.stream(Utils.DBFILE, 0, 10, True))), 108)
+
+    def testStreamWorkers(self):
+        """
+        Test row streaming with a pool of worker processes
+        """
+
+        # Worker pool stream must match the single process stream, including order
+        self.assertEqual(
+            list(Index.stream(Utils.DBFILE, 0, 0, True, 2, 500)),
+            list(Index.stream(Utils.DBFILE, 0, 0, True)),
+        )
+
+    def testUpdate(self):
+        """
+        Test incremental index updates
+        """
+
+        # Build index in a separate model path
+        path = os.path.join(tempfile.gettempdir(), "paperai.update")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+        dbfile = os.path.join(path, "articles.sqlite")
+
+        Index.run(path, Utils.VECTORFILE, 10, fts=True)
+        self.assertEqual(Manifest(path).metadata()["maxsize"], "10")
+
+        # Remove an article and change another
+        with sqlite3.connect(dbfile) as db:
+            uids = [row[0] for row in db.execute(f"SELECT DISTINCT article FROM sections WHERE article IN ({Index.articles(10, 0)})")]
+            db.execute("DELETE FROM articles WHERE id = ?", [uids[0]])
+            db.execute("DELETE FROM sections WHERE article = ?", [uids[0]])
+            db.execute("UPDATE articles SET entry = '2099-01-01' WHERE id = ?", [uids[1]])
+
+        # Sections are deleted in a single pass and the full text index is updated in place
+        with patch.object(Index, "delete", wraps=Index.delete) as delete, patch.object(FTS, "build", wraps=FTS.build) as build:
+            Index.update(path)
+            delete.assert_called_once()
+            build.assert_not_called()
+
+        # Index must match the current articles database
+        embeddings = Embeddings()
+        embeddings.load(path)
+        self.assertEqual(embeddings.count(), len(list(Index.stream(dbfile, 10, 0, True))))
+        self.assertEqual(Manifest(path).metadata()["entry"], "2099-01-01")
+
+        # Updated full text index must match a full text index rebuild
+        rows = []
+        for rebuild in [False, True]:
+            if rebuild:
+                Index.fulltext(path, 10, 0, True)
+
+            db = sqlite3.connect(os.path.join(path, FTS.FILE))
+            rows.append(db.execute("SELECT rowid, Text FROM sections ORDER BY rowid").fetchall())
+            db.close()
+
+        self.assertEqual(rows[0], rows[1])
+
+    def testUpdateInterrupted(self):
+        """
+        Test the existing manifest is kept when a full index run fails
+        """
+
+        path = os.path.join(tempfile.gettempdir(), "paperai.interrupted")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+
+        Index.run(path, Utils.VECTORFILE, 10)
+        metadata = Manifest(path).metadata()
+
+        # Interrupt a full index run
+        with patch.object(Index, "embeddings", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                Index.run(path, Utils.VECTORFILE, 20)
+
+        self.assertEqual(Manifest(path).metadata(), metadata)
+
+        # Manifest without metadata
+        with open(os.path.join(path, "manifest.sqlite"), "wb"):
+            pass
+
+        with self.assertRaises(ValueError):
+            Index.update(path)
@@ -0,0 +1,49 @@
+"""
+MinHash module tests
+"""
+
+import unittest
+
+from paperai.minhash import MinHash
+
+
+class TestMinHash(unittest.TestCase):
+    """
+    MinHash tests
+    """
+
+    def testSignature(self):
+        """
+        Test building signatures
+        """
+
+        signature = MinHash.signature(["risk", "factors", "hypertension", "risk"])
+
+        self.assertEqual(len(signature), MinHash.PERMUTATIONS)
+        self.assertTrue((signature == MinHash.signature({"hypertension", "factors", "risk"})).all())
+        self.assertTrue((signature == MinHash.deserialize(MinHash.serialize(signature))).all())
+        self.assertIsNone(MinHash.signature([]))
+
+    def testSimilarity(self):
+        """
+        Test estimating the Jaccard index
+        """
+
+        tokens1 = {f"token{x}" for x in range(100)}
+        tokens2 = {f"token{x}" for x in range(50, 150)}
+
+        self.assertEqual(MinHash.similarity(MinHash.signature(tokens1), MinHash.signature(tokens1)), 1.0)
+        self.assertAlmostEqual(MinHash.similarity(MinHash.signature(tokens1), MinHash.signature(tokens2)), 1 / 3, delta=0.15)
+
+    def testQuery(self):
+        """
+        Test finding near-duplicate candidates
+        """
+
+        index = MinHash()
+        index.insert(1, MinHash.signature({f"token{x}" for x in range(100)}))
+        index.insert(2, MinHash.signature({f"other{x}" for x in range(100)}))
+        index.insert(3, None)
+
+        self.assertEqual(index.query(MinHash.signature({f"token{x}" for x in range(1, 101)})), {1})
+        self.assertEqual(index.query(None), set())
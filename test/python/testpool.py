@@ -0,0 +1,64 @@
+"""
+Pool module tests
+"""
+
+import sqlite3
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from paperai.pool import ConnectionPool
+
+# pylint: disable=C0411
+from utils import Utils
+
+
+class TestPool(unittest.TestCase):
+    """
+    Pool tests
+    """
+
+    def testCheckout(self):
+        """
+        Test connections are reused and read-only
+        """
+
+        pool = ConnectionPool(Utils.DBFILE, 2)
+
+        with pool.connection() as db:
+            first = db
+            self.assertGreater(db.execute("SELECT count(*) FROM sections").fetchone()[0], 0)
+
+            # Connections are read-only
+            with self.assertRaises(sqlite3.OperationalError):
+                db.execute("DELETE FROM sections")
+
+        # Idle connection is reused
+        with pool.connection() as db:
+            self.assertIs(db, first)
+
+        pool.close()
+        self.assertEqual(pool.opened, 0)
+
+        # Closed pool doesn't return connections
+        with self.assertRaises(ValueError):
+            pool.checkout()
+
+    def testThreads(self):
+        """
+        Test pool size is bounded across threads
+        """
+
+        pool = ConnectionPool(Utils.DBFILE, 2)
+
+        def count(_):
+            with pool.connection() as db:
+                return db.execute("SELECT count(*) FROM articles").fetchone()[0]
+
+        with ThreadPoolExecutor(8) as executor:
+            counts = list(executor.map(count, range(100)))
+
+        self.assertEqual(len(set(counts)), 1)
+        self.assertLessEqual(pool.opened, 2)
+
+        pool.close()
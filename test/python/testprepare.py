@@ -0,0 +1,118 @@
+"""
+Prepare module tests
+"""
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+from paperai.export import Export
+from paperai.highlights import Highlights
+from paperai.index import Index
+from paperai.minhash import MinHash
+from paperai.prepare import Prepare
+from paperai.vectors import RowIterator
+
+# pylint: disable=C0411
+from utils import Utils
+
+
+class TestPrepare(unittest.TestCase):
+    """
+    Prepare tests
+    """
+
+    def testRun(self):
+        """
+        Test prepare run
+        """
+
+        path = os.path.join(tempfile.gettempdir(), "paperai.prepare")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+
+        dbfile = os.path.join(path, "articles.sqlite")
+        Prepare.run(path)
+
+        with sqlite3.connect(dbfile) as db:
+            self.assertTrue(Prepare.exists(db))
+
+        # Sections filtered in SQL match sections filtered with the section filter
+        self.assertEqual(list(Index.stream(dbfile, 0, 0, True)), list(Index.stream(Utils.DBFILE, 0, 0, True)))
+
+        Export.run(os.path.join(path, "export.txt"), path)
+        self.assertEqual(Utils.linecount(os.path.join(path, "export.txt")), 29841)
+
+    def testNewSections(self):
+        """
+        Test sections added after a prepare run
+        """
+
+        path = os.path.join(tempfile.gettempdir(), "paperai.prepare.new")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+
+        dbfile = os.path.join(path, "articles.sqlite")
+        Prepare.run(path)
+
+        # Copy a section to a new row
+        with sqlite3.connect(dbfile) as db:
+            db.execute("INSERT INTO sections (Id, Article, Name, Text) SELECT max(id) + 1, Article, Name, Text FROM sections")
+            self.assertFalse(Prepare.exists(db))
+
+        # Prepare only new sections
+        Prepare.run(path)
+
+        with sqlite3.connect(dbfile) as db:
+            self.assertTrue(Prepare.exists(db))
+
+    def testTokens(self):
+        """
+        Test token cache
+        """
+
+        path = os.path.join(tempfile.gettempdir(), "paperai.prepare.tokens")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+
+        dbfile = os.path.join(path, "articles.sqlite")
+        Prepare.run(path, tokens=True)
+
+        with sqlite3.connect(dbfile) as db:
+            self.assertTrue(Prepare.attach(db, dbfile))
+            self.assertEqual(
+                db.execute("SELECT count(*) FROM tokens.tokens").fetchone()[0], db.execute("SELECT count(*) FROM sections").fetchone()[0]
+            )
+
+        # Cached tokens match tokenized text
+        self.assertEqual(list(Index.stream(dbfile, 0, 0, True)), list(Index.stream(Utils.DBFILE, 0, 0, True)))
+        self.assertEqual(len(list(RowIterator(dbfile))), 34222)
+
+    def testSignatures(self):
+        """
+        Test signatures in the token cache
+        """
+
+        path = os.path.join(tempfile.gettempdir(), "paperai.prepare.signatures")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+
+        dbfile = os.path.join(path, "articles.sqlite")
+        Prepare.run(path, signatures=True)
+
+        with sqlite3.connect(dbfile) as db:
+            self.assertTrue(Prepare.attach(db, dbfile))
+            self.assertTrue(Prepare.signed(db))
+
+            # Cached signatures match signatures of highlight tokens
+            rows = db.execute("SELECT Id, Text FROM sections ORDER BY Id LIMIT 100").fetchall()
+            signatures = Prepare.signatures(db, [uid for uid, _ in rows])
+
+        for uid, text in rows:
+            signature = MinHash.signature(Highlights.tokenize(text))
+            if signature is None:
+                self.assertNotIn(uid, signatures)
+            else:
+                self.assertTrue((signatures[uid] == signature).all())
@@ -2,10 +2,18 @@
 Query module tests
 """
 
+import os
+import shutil
+import tempfile
 import unittest
 
 from contextlib import redirect_stdout
+from unittest.mock import patch
 
+from paperai.cache import ResultCache
+from paperai.fts import FTS
+from paperai.index import Index
+from paperai.models import Models
 from paperai.query import Query
 
 # pylint: disable=C0411
@@ -46,3 +54,175 @@ class TestQuery(unittest.TestCase):
                 Query.run("risk factors studied", 10, Utils.PATH)
 
         self.assertEqual(Utils.linecount(Utils.PATH + "/query.txt"), 106)
+
+    @patch("paperai.query.Query.BATCH", 3)
+    def testSections(self):
+        """
+        Test resolving section ids in batches
+        """
+
+        db = Models.connect(Utils.DBFILE)
+        cur = db.cursor()
+
+        ids = [row[0] for row in cur.execute("SELECT Id FROM sections ORDER BY Id LIMIT 10")]
+        sections = Query.sections(cur, ids + [-1])
+
+        # All ids resolved, unknown ids skipped
+        self.assertEqual(list(sorted(sections)), ids)
+        for uid in ids:
+            self.assertEqual(sections[uid], cur.execute("SELECT Article, Text FROM sections WHERE id = ?", [uid]).fetchone())
+
+        db.close()
+
+    @patch("paperai.query.Query.BATCH", 3)
+    def testMetadata(self):
+        """
+        Test bulk article metadata lookup
+        """
+
+        db = Models.connect(Utils.DBFILE)
+        cur = db.cursor()
+
+        ids = [row[0] for row in cur.execute("SELECT Id FROM articles ORDER BY Id LIMIT 10")]
+        articles = Query.metadata(cur, ids, ["Title", "Reference"])
+
+        self.assertEqual(list(sorted(articles)), ids)
+        for uid in ids:
+            self.assertEqual(articles[uid], cur.execute("SELECT Title, Reference FROM articles WHERE id = ?", [uid]).fetchone())
+
+        db.close()
+
+    def testBatchSearch(self):
+        """
+        Test batch search matches individual searches
+        """
+
+        embeddings, db = Models.load(Utils.PATH)
+        cur = db.cursor()
+
+        queries = ["risk factors studied", "*", "+hypertension risk -smoking"]
+        results = Query.batchsearch(embeddings, cur, queries, 10, None)
+
+        self.assertEqual(len(results), len(queries))
+        self.assertEqual(results[1], [])
+
+        for query, result in zip(queries, results):
+            self.assertEqual([row[0] for row in result], [row[0] for row in Query.search(embeddings, cur, query, 10, None)])
+
+        Models.close(db)
+
+    def testAdaptive(self):
+        """
+        Test adaptive candidate window
+        """
+
+        embeddings, db = Models.load(Utils.PATH)
+        cur = db.cursor()
+
+        metrics = {}
+        results = Query.search(embeddings, cur, "+hypertension risk factors", 10, None, True, metrics)
+        fixed = Query.search(embeddings, cur, "+hypertension risk factors", 10, None)
+
+        # Adaptive search matches at least as many documents as a fixed window
+        self.assertGreaterEqual(len(Query.documents(results, 10)), min(len(Query.documents(fixed, 10)), 10))
+        self.assertEqual(len(metrics["candidates"]), 1)
+
+        Models.close(db)
+
+    def testFullText(self):
+        """
+        Test search with a full text index
+        """
+
+        # Build a full text index for a copy of the test database
+        path = os.path.join(tempfile.gettempdir(), "paperai.query.fts")
+        os.makedirs(path, exist_ok=True)
+        shutil.copy(Utils.DBFILE, path)
+        Index.fulltext(path, 0, 0, True)
+
+        embeddings, articles = Models.load(Utils.PATH)
+        db = Models.connect(os.path.join(path, "articles.sqlite"))
+        self.assertTrue(FTS.attach(db, os.path.join(path, "articles.sqlite")))
+        cur = db.cursor()
+
+        # Sections with required terms are ranked directly
+        metrics = {}
+        results = Query.search(embeddings, cur, "+hypertension risk", 10, None, metrics=metrics)
+        self.assertTrue(results)
+        self.assertTrue(all("hypertension" in text.lower() for _, _, _, text in results))
+        self.assertEqual(metrics["candidates"], [len(FTS.match(cur, ["hypertension"], []))])
+
+        # Prohibited terms filter search candidates
+        results = Query.search(embeddings, cur, "risk factors -smoking", 10, None, metrics=metrics)
+        self.assertTrue(results)
+        self.assertTrue(all("smoking" not in text.lower() for _, _, _, text in results))
+        self.assertEqual(metrics["candidates"], [50])
+
+        # Terms shorter than the trigram tokenizer supports fall back to search candidates
+        results = Query.search(embeddings, cur, "+ci risk", 10, None, metrics=metrics)
+        self.assertTrue(all("ci" in text.lower() for _, _, _, text in results))
+        self.assertEqual(metrics["candidates"], [50])
+
+        # Required terms with more than FTS.LIMIT matches fall back to search candidates
+        with patch.object(FTS, "LIMIT", 5):
+            results = Query.search(embeddings, cur, "+hypertension risk", 10, None, metrics=metrics)
+            self.assertTrue(all("hypertension" in text.lower() for _, _, _, text in results))
+            self.assertEqual(metrics["candidates"], [50])
+
+        Models.close(articles)
+        db.close()
+
+    def testCache(self):
+        """
+        Test cached search results
+        """
+
+        embeddings, db = Models.load(Utils.PATH)
+        cur = db.cursor()
+
+        cache = ResultCache(Utils.PATH)
+        results = Query.search(embeddings, cur, "risk factors studied", 10, None, cache=cache)
+
+        self.assertEqual(Query.search(embeddings, cur, "risk  factors studied", 10, None, cache=cache), results)
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+        Models.close(db)
+
+    def testDocuments(self):
+        """
+        Test grouping results by article
+        """
+
+        results = [(1, 0.9, "a", "x"), (2, 0.5, "b", "y"), (3, 0.45, "b", "z"), (4, 0.8, "c", "w"), (5, 0.9, "a", "x"), (6, 0.1, "d", "v")]
+        documents = Query.documents(results, 3)
+
+        # Top 3 articles by best section, ordered by sum of unique section scores
+        self.assertEqual(list(documents), ["b", "a", "c"])
+        self.assertEqual(documents["b"], [(0.5, "y"), (0.45, "z")])
+        self.assertEqual(documents["a"], [(0.9, "x")])
+
+    def testDuplicates(self):
+        """
+        Test skipping near-duplicate articles
+        """
+
+        results = [
+            (1, 0.9, "a", "Hypertension is a risk factor for severe disease"),
+            (2, 0.85, "b", "Hypertension is a risk factor for severe disease."),
+            (3, 0.5, "c", "Smoking was not associated with mortality"),
+            (4, 0.4, "b", "Diabetes increases the risk of severe disease"),
+        ]
+
+        self.assertEqual(list(Query.documents(results, 2)), ["b", "a"])
+        self.assertEqual(list(Query.documents(results, 2, True)), ["a", "c"])
+
+    def testText(self):
+        """
+        Test formatting match text
+        """
+
+        text = "Risk factors [1, 2] include hypertension (3) • see https://doi.org/10 for details"
+
+        self.assertEqual(Query.text(text), "Risk factors include hypertension  see  for details")
+        self.assertEqual(Query.text(text), Query.text.__wrapped__(text))
+        self.assertIsNone(Query.text(None))
@@ -4,9 +4,12 @@ Shell module tests
 
 import contextlib
 import io
+import sys
 import unittest
 
-from paperai.shell import Shell
+from unittest.mock import patch
+
+from paperai.shell import Shell, main
 
 # pylint: disable=C0411
 from utils import Utils
@@ -31,3 +34,38 @@ class TestShell(unittest.TestCase):
         shell.postloop()
 
         self.assertTrue("hypertension" in output.getvalue())
+
+    def testCache(self):
+        """
+        Test shell result cache is opt-in
+        """
+
+        shell = Shell(Utils.PATH)
+        shell.preloop()
+        self.assertIsNone(shell.cache)
+        shell.postloop()
+
+        shell = Shell(Utils.PATH, True)
+        shell.preloop()
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            shell.default("+hypertension ci")
+            shell.default("+hypertension ci")
+            shell.onecmd("stats")
+        shell.postloop()
+
+        self.assertEqual(shell.cache.stats()["hits"], 1)
+        self.assertIn("Result cache: 1 hits, 1 misses, 1 entries", output.getvalue())
+
+    def testMain(self):
+        """
+        Test shell command line arguments
+        """
+
+        for argv, cache in [(["paperai", Utils.PATH], False), (["paperai", "--cache", Utils.PATH], True)]:
+            with patch.object(sys, "argv", argv), patch.object(Shell, "cmdloop", autospec=True) as cmdloop:
+                main()
+
+            shell = cmdloop.call_args[0][0]
+            self.assertEqual((shell.path, shell.cache), (Utils.PATH, cache))
@@ -0,0 +1,38 @@
+"""
+Spill module tests
+"""
+
+import unittest
+
+from paperai.spill import Spill
+
+
+class TestSpill(unittest.TestCase):
+    """
+    Spill tests
+    """
+
+    def testReplay(self):
+        """
+        Test writing and replaying a spill cache
+        """
+
+        documents = [(0, ["risk", "factors"], None), (5, [], None), (7, ["hypertension", "risk"], None)]
+
+        with Spill() as cache:
+            # Writing passes documents through
+            self.assertEqual(list(cache(documents)), documents)
+
+            # Replays documents, including multiple times
+            self.assertEqual(len(cache), 3)
+            self.assertEqual(list(cache), documents)
+            self.assertEqual(list(cache), documents)
+
+    def testEmpty(self):
+        """
+        Test replaying a spill cache with no tokens
+        """
+
+        with Spill() as cache:
+            list(cache([(0, [], None)]))
+            self.assertEqual(list(cache), [(0, [], None)])
@@ -3,6 +3,8 @@ Vectors module tests
 """
 
 import os
+import shutil
+import tempfile
 import unittest
 
 from paperai.vectors import RowIterator, Vectors
@@ -32,6 +34,39 @@ class TestVectors(unittest.TestCase):
         output = Vectors.tokens(Utils.DBFILE)
         self.assertEqual(Utils.linecount(output), 34222)
 
+    def testTokensWorkers(self):
+        """
+        Test tokens file creation with worker processes
+        """
+
+        serial, parallel = Vectors.tokens(Utils.DBFILE), Vectors.tokens(Utils.DBFILE, 2, 500)
+
+        with open(serial, "r", encoding="utf-8") as f1, open(parallel, "r", encoding="utf-8") as f2:
+            self.assertEqual(f1.read(), f2.read())
+
+    def testCache(self):
+        """
+        Test tokens file cache
+        """
+
+        cache = os.path.join(tempfile.gettempdir(), "paperai.tokens")
+        shutil.rmtree(cache, ignore_errors=True)
+
+        # Tokens file is built once and reused for the same data
+        path = Vectors.cached(Utils.DBFILE, cache)
+        modified = os.path.getmtime(path)
+
+        self.assertEqual(Vectors.cached(Utils.DBFILE, cache), path)
+        self.assertEqual(os.path.getmtime(path), modified)
+        self.assertEqual(Utils.linecount(path), 34222)
+
+        # Tokens files for other data are removed
+        stale = os.path.join(cache, "tokens-0000000000000000.txt")
+        os.rename(path, stale)
+
+        path = Vectors.cached(Utils.DBFILE, cache)
+        self.assertEqual(os.listdir(cache), [os.path.basename(path)])
+
     def testRun(self):
         """
         Test word vectors creation